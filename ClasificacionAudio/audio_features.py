@@ -0,0 +1,254 @@
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Forma del espectrograma de un audio de 1 segundo a 16 kHz con los parámetros por defecto
+# de librosa.stft (n_fft=2048 -> 1025 frecuencias, hop_length=512 -> 32 ventanas)
+SPECTROGRAM_SHAPE = (1025, 32)
+DTYPE = np.float32
+
+# Carpeta del almacén de características (junto a los notebooks)
+STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'espectrogramas')
+FEATURES_FILE = 'features.f32'
+INDEX_FILE = 'index.json'
+
+# Archivos por tarea que se envía a cada proceso
+CHUNK_FILES = 32
+
+
+# Función para calcular la huella del contenido de un archivo (se lee por bloques)
+def content_hash(path, block_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Función para calcular el espectrograma en dB de un audio (igual que en el notebook).
+# librosa solo se necesita para extraer; leer el almacén no lo requiere
+def spectrogram(path):
+    import librosa
+
+    wav, sr = librosa.load(path, sr=None)
+    return librosa.amplitude_to_db(np.abs(librosa.stft(wav)), ref=np.max).astype(DTYPE)
+
+
+# Cada proceso abre una sola vez el archivo de características y escribe directamente
+# en las filas que le tocan, así los espectrogramas no vuelven al proceso principal
+_worker_features = None
+
+
+def _open_worker(features_path, rows, shape):
+    global _worker_features
+    _worker_features = np.memmap(features_path, dtype=DTYPE, mode='r+', shape=(rows, *shape))
+
+
+# Función que corre en cada proceso: extrae los audios de una tarea y los escribe en sus
+# filas. Devuelve los archivos que fallaron (o cuyo espectrograma no tiene la forma esperada)
+def _extract_chunk(tasks):
+    failed = []
+    for path, row in tasks:
+        try:
+            features = spectrogram(path)
+        except Exception as error:
+            failed.append((path, f'{type(error).__name__}: {error}'))
+            continue
+        if features.shape != _worker_features.shape[1:]:
+            failed.append((path, f'forma {features.shape}, se esperaba {_worker_features.shape[1:]}'))
+            continue
+        _worker_features[row] = features
+    _worker_features.flush()
+    return failed
+
+
+# Función para listar los audios de cada carpeta con su etiqueta (el índice de la carpeta)
+def list_dataset(dataset_paths):
+    files, labels = [], []
+    for index, dataset in enumerate(dataset_paths):
+        names = sorted(name for name in os.listdir(dataset) if name.lower().endswith('.wav'))
+        files += [os.path.abspath(os.path.join(dataset, name)) for name in names]
+        labels += [index] * len(names)
+    return files, labels
+
+
+# Almacén de espectrogramas en disco: un solo archivo np.memmap (filas x 1025 x 32, float32)
+# y un índice JSON ruta -> (huella del contenido, fila). Al actualizar solo se extraen los
+# audios nuevos o modificados; leer las características no copia el archivo a memoria
+class FeatureStore:
+    def __init__(self, directory=STORE_DIR, shape=SPECTROGRAM_SHAPE):
+        self.directory = directory
+        self.shape = tuple(shape)
+        self.features_path = os.path.join(directory, FEATURES_FILE)
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self.index = {'shape': list(self.shape), 'rows': 0, 'free': [], 'files': {}, 'failed': {}}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding='utf-8') as f:
+                self.index = json.load(f)
+            if tuple(self.index['shape']) != self.shape:
+                raise ValueError(f"El almacén {directory} guarda espectrogramas de forma {tuple(self.index['shape'])}, no {self.shape}")
+            # Índices creados antes de registrar los audios que fallaron
+            self.index.setdefault('failed', {})
+
+    def __len__(self):
+        return len(self.index['files'])
+
+    def __contains__(self, path):
+        return os.path.abspath(path) in self.index['files']
+
+    # Todas las filas del archivo (memory-map de solo lectura)
+    def features(self):
+        if self.index['rows'] == 0:
+            return np.empty((0, *self.shape), dtype=DTYPE)
+        return np.memmap(self.features_path, dtype=DTYPE, mode='r', shape=(self.index['rows'], *self.shape))
+
+    # Función para saber qué audios hay que extraer: los que no están en el índice o cuyo
+    # contenido cambió. Si la fecha de modificación y el tamaño no cambiaron no se vuelve
+    # a leer el archivo para calcular su huella. Los audios que ya fallaron no se vuelven
+    # a intentar hasta que cambie su contenido
+    def pending(self, paths):
+        pending = {}
+        for path in map(os.path.abspath, paths):
+            stat = os.stat(path)
+            entry = self.index['files'].get(path) or self.index['failed'].get(path)
+            if entry is not None and entry['stat'] == [stat.st_mtime_ns, stat.st_size]:
+                continue
+            digest = content_hash(path)
+            if entry is not None and entry['hash'] == digest:
+                entry['stat'] = [stat.st_mtime_ns, stat.st_size]
+                continue
+            pending[path] = {'hash': digest, 'stat': [stat.st_mtime_ns, stat.st_size]}
+        return pending
+
+    # Audios que fallaron en una extracción anterior y no cambiaron desde entonces
+    def known_failures(self, paths):
+        failed = self.index['failed']
+        return [(path, failed[path]['error']) for path in map(os.path.abspath, paths) if path in failed]
+
+    # Función para extraer en paralelo los audios nuevos o modificados. Cada uno se escribe en
+    # una fila libre (nunca sobre la fila vigente de otro audio), y el índice se guarda al
+    # final, así una extracción interrumpida no deja el almacén inconsistente
+    def update(self, paths, workers=None, chunk_files=CHUNK_FILES):
+        pending = self.pending(paths)
+        skipped = [(path, error) for path, error in self.known_failures(paths) if path not in pending]
+        if not pending:
+            self.save_index()
+            return {'nuevos': 0, 'fallidos': [], 'omitidos': skipped}
+
+        free = list(self.index['free'])
+        rows = self.index['rows']
+        for entry in pending.values():
+            if free:
+                entry['row'] = free.pop(0)
+            else:
+                entry['row'] = rows
+                rows += 1
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.features_path, 'ab') as f:
+            f.truncate(rows * int(np.prod(self.shape)) * np.dtype(DTYPE).itemsize)
+
+        tasks = [(path, entry['row']) for path, entry in pending.items()]
+        chunks = [tasks[i:i + chunk_files] for i in range(0, len(tasks), chunk_files)]
+        failed = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_open_worker, initargs=(self.features_path, rows, self.shape)) as pool:
+            for chunk_failed in pool.map(_extract_chunk, chunks):
+                failed += chunk_failed
+
+        # Los audios que fallaron quedan registrados con su huella (para no reintentarlos
+        # mientras no cambien) y su fila queda libre; las filas anteriores de los audios
+        # modificados también se liberan
+        errors = dict(failed)
+        for path, entry in pending.items():
+            previous = self.index['files'].pop(path, None)
+            if previous is not None:
+                free.append(previous['row'])
+            if path in errors:
+                free.append(entry.pop('row'))
+                self.index['failed'][path] = {**entry, 'error': errors[path]}
+                continue
+            self.index['failed'].pop(path, None)
+            self.index['files'][path] = entry
+        self.index['rows'], self.index['free'] = self.compact(pending, self.index['rows'], rows, free)
+        self.save_index()
+        return {'nuevos': len(pending) - len(failed), 'fallidos': failed, 'omitidos': skipped}
+
+    # Función para quitar los huecos que dejaron los audios fallidos al final del archivo:
+    # las filas nuevas de esta extracción (desde first_row) se mueven hacia arriba en orden,
+    # así los audios de una misma carpeta siguen en filas consecutivas y take() devuelve
+    # una vista del memory-map. Devuelve la nueva cantidad de filas y las filas libres
+    def compact(self, pending, first_row, rows, free):
+        appended = sorted((entry['row'], path) for path, entry in pending.items() if 'row' in entry and entry['row'] >= first_row)
+        free = [row for row in free if row < first_row]
+        if len(appended) == rows - first_row:
+            return rows, sorted(free)
+
+        features = np.memmap(self.features_path, dtype=DTYPE, mode='r+', shape=(rows, *self.shape))
+        for target, (row, path) in enumerate(appended, start=first_row):
+            if row != target:
+                features[target] = features[row]
+                self.index['files'][path]['row'] = target
+        features.flush()
+        del features
+        rows = first_row + len(appended)
+        with open(self.features_path, 'r+b') as f:
+            f.truncate(rows * int(np.prod(self.shape)) * np.dtype(DTYPE).itemsize)
+        return rows, sorted(free)
+
+    def save_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+    # Filas de una lista de audios (deben estar en el almacén)
+    def rows(self, paths):
+        return np.array([self.index['files'][os.path.abspath(path)]['row'] for path in paths], dtype=np.int64)
+
+    # Espectrogramas de una lista de audios. Si sus filas son consecutivas (lo normal cuando
+    # el almacén se creó con las mismas carpetas) se devuelve una vista del memory-map sin
+    # copiar; si no, se copian solo esas filas
+    def take(self, paths):
+        rows = self.rows(paths)
+        features = self.features()
+        if len(rows) and np.array_equal(rows, np.arange(rows[0], rows[0] + len(rows))):
+            return features[rows[0]:rows[0] + len(rows)]
+        return features[rows]
+
+    # Equivalente a parse_dataset del notebook: (espectrogramas, etiquetas) de las carpetas,
+    # extrayendo antes lo que falte
+    def parse_dataset(self, dataset_paths, workers=None):
+        files, labels = list_dataset(dataset_paths)
+        for dataset in dataset_paths:
+            print("[+] Parsing {} data...".format(dataset))
+        result = self.update(files, workers)
+        for path, error in result['fallidos'] + result['omitidos']:
+            print(f"[!] {path}: {error}")
+        kept = [i for i, path in enumerate(files) if path in self]
+        return self.take([files[i] for i in kept]), np.array(labels)[kept]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extrae en paralelo los espectrogramas de los audios y los guarda en un almacén np.memmap.')
+    parser.add_argument('datasets', nargs='+', help='Carpetas con los audios (.wav) de cada persona')
+    parser.add_argument('--store', default=STORE_DIR, help='Carpeta del almacén de características')
+    parser.add_argument('--workers', type=int, help='Procesos de extracción (por defecto, uno por CPU)')
+    args = parser.parse_args()
+
+    store = FeatureStore(args.store)
+    files, _ = list_dataset(args.datasets)
+    result = store.update(files, args.workers)
+    for path, error in result['fallidos']:
+        print(f"[!] {path}: {error}")
+    if result['omitidos']:
+        print(f"{len(result['omitidos'])} audios omitidos porque ya fallaron y no cambiaron")
+    print(f"{result['nuevos']} audios extraídos, {len(store)} en el almacén ({store.features_path})")
+
+
+if __name__ == '__main__':
+    main()
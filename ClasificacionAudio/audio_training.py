@@ -0,0 +1,87 @@
+import numpy as np
+
+from audio_features import DTYPE
+
+# Los notebooks dividen los espectrogramas (en dB) por 255 antes de entrenar
+SCALE = 255
+
+# Filas que se leen del almacén en cada bloque
+BATCH_ROWS = 256
+
+
+# Función para preparar los espectrogramas de las filas dadas (todas si rows es None) en un
+# solo arreglo float32 de (audios x 1025*32), ya dividido por SCALE. Se escribe por bloques
+# sobre el arreglo de salida, sin las copias intermedias de np.array, reshape y astype.
+# out puede ser un arreglo o un np.memmap ya creado con la forma final
+def prep_features(X, rows=None, out=None, batch_rows=BATCH_ROWS):
+    rows = np.arange(len(X)) if rows is None else check_rows(X, rows)
+    size = int(np.prod(X.shape[1:]))
+    if out is None:
+        out = np.empty((len(rows), size), dtype=DTYPE)
+    for start in range(0, len(rows), batch_rows):
+        block = out[start:start + batch_rows]
+        read_rows(X, rows[start:start + batch_rows], block)
+    return out
+
+
+# Función para validar las filas pedidas una sola vez, antes de leer por bloques.
+# read_rows usa mode='clip', que no falla con un índice fuera de rango sino que lo
+# reemplaza por la primera o la última fila
+def check_rows(X, rows):
+    rows = np.asarray(rows)
+    if rows.size and (rows.min() < 0 or rows.max() >= len(X)):
+        raise IndexError(f"Filas fuera de rango: el almacén tiene {len(X)} filas y se pidieron filas entre {rows.min()} y {rows.max()}")
+    return rows
+
+
+# Función para leer filas del almacén directamente en un bloque de salida y normalizarlas
+# en el mismo lugar. Con mode='clip' np.take escribe en out sin pasar por un buffer
+# intermedio, pero un índice fuera de rango se leería en silencio como la primera o la
+# última fila: las filas se validan antes con check_rows
+def read_rows(X, rows, out):
+    target = out.reshape(len(rows), *X.shape[1:])
+    np.take(X, rows, axis=0, out=target, mode='clip')
+    np.divide(out, SCALE, out=out)
+    return out
+
+
+# Función para recorrer los audios en bloques de batch_rows filas (mezclados en cada
+# época con rng). Todos los bloques se escriben en el mismo buffer, así la memoria depende
+# del tamaño del bloque y no del conjunto de datos. Dentro de cada bloque las filas se
+# leen en orden, lo que en el memory-map son lecturas casi secuenciales
+def iter_batches(X, y, rows=None, batch_rows=BATCH_ROWS, rng=None):
+    rows = np.arange(len(X)) if rows is None else check_rows(X, rows)
+    y = np.asarray(y)
+    order = np.arange(len(rows)) if rng is None else rng.permutation(len(rows))
+    buffer = np.empty((min(batch_rows, len(rows)), int(np.prod(X.shape[1:]))), dtype=DTYPE)
+    for start in range(0, len(rows), batch_rows):
+        batch = np.sort(order[start:start + batch_rows])
+        yield read_rows(X, rows[batch], buffer[:len(batch)]), y[batch]
+
+
+# Función para entrenar un MLPClassifier (o cualquier modelo con partial_fit) por bloques
+# leídos del almacén. y tiene la etiqueta de cada fila de rows. Cada época es una pasada
+# por todos los bloques; igual que MLPClassifier.fit, se detiene antes de max_iter cuando
+# la pérdida no mejora en tol durante n_iter_no_change épocas
+def train_mlp(clf, X, y, rows=None, classes=None, epochs=None, batch_rows=BATCH_ROWS, seed=0):
+    y = np.asarray(y)
+    classes = np.unique(y) if classes is None else classes
+    epochs = epochs or getattr(clf, 'max_iter', 200)
+    tol = getattr(clf, 'tol', 1e-4)
+    patience = getattr(clf, 'n_iter_no_change', 10)
+    rng = np.random.default_rng(seed)
+
+    best_loss, no_change = np.inf, 0
+    for epoch in range(epochs):
+        loss, seen = 0.0, 0
+        for X_batch, y_batch in iter_batches(X, y, rows, batch_rows, rng):
+            clf.partial_fit(X_batch, y_batch, classes=classes)
+            loss += getattr(clf, 'loss_', 0.0) * len(y_batch)
+            seen += len(y_batch)
+        loss /= max(seen, 1)
+
+        no_change = no_change + 1 if loss > best_loss - tol else 0
+        best_loss = min(best_loss, loss)
+        if no_change >= patience:
+            break
+    return clf
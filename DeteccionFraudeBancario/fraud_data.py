@@ -0,0 +1,182 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_PATH = os.path.join(BASE_DIR, 'creditcard.csv')
+SPLITS_DIR = os.path.join(BASE_DIR, 'creditcard_splits')
+META_FILE = 'meta.json'
+
+# Columnas del CSV de Kaggle: V1-V28 (componentes PCA) se guardan en float32; Time y
+# Amount tienen otra escala y se guardan aparte en float64
+FEATURE_COLUMNS = [f'V{i}' for i in range(1, 29)]
+EXTRA_COLUMNS = ['Time', 'Amount']
+LABEL_COLUMN = 'Class'
+CSV_DTYPES = {**dict.fromkeys(FEATURE_COLUMNS, np.float32), **dict.fromkeys(EXTRA_COLUMNS, np.float64), LABEL_COLUMN: np.uint8}
+
+# Proporciones de cada subconjunto (las mismas de train_val_test_split: 60% / 20% / 20%)
+SPLITS = {'train': 0.6, 'val': 0.2, 'test': 0.2}
+
+# Archivos binarios de cada subconjunto: sufijo -> (columnas, tipo). Se abren con np.memmap
+SPLIT_FILES = {
+    'V.f32': (FEATURE_COLUMNS, np.float32),
+    'extra.f64': (EXTRA_COLUMNS, np.float64),
+    'y.u8': ([LABEL_COLUMN], np.uint8),
+    'row.i64': (['row'], np.int64),  # Fila original en el CSV
+}
+
+# Filas del CSV que se leen por bloque
+CHUNK_ROWS = 50_000
+
+
+def split_path(directory, split, suffix):
+    return os.path.join(directory, f'{split}.{suffix}')
+
+
+# Versión del CSV (fecha de modificación y tamaño) con la que se generaron los subconjuntos
+def source_version(csv_path):
+    stat = os.stat(csv_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+# Función para repartir n filas entre los subconjuntos de modo que el total acumulado de
+# cada uno quede lo más cerca posible de su proporción (mayor resto). assigned tiene las
+# filas que ya recibió cada subconjunto
+def allocate(n, assigned, fractions):
+    total = assigned.sum() + n
+    ideal = total * fractions
+    target = np.floor(ideal).astype(np.int64)
+    target[np.argsort(target - ideal, kind='stable')[:total - target.sum()]] += 1
+    return np.maximum(target - assigned, 0)
+
+
+# Asignación estratificada por bloques: dentro de cada clase, las filas de un bloque se
+# reparten al azar entre los subconjuntos respetando las proporciones acumuladas, así al
+# final cada subconjunto tiene la misma proporción de fraudes que el CSV completo
+class StratifiedAssigner:
+    def __init__(self, fractions=SPLITS, seed=42):
+        self.fractions = np.array(list(fractions.values()), dtype=float)
+        self.assigned = {}
+        self.rng = np.random.default_rng(seed)
+
+    # Índice del subconjunto de cada fila del bloque
+    def assign(self, labels):
+        result = np.empty(len(labels), dtype=np.int8)
+        for label in np.unique(labels):
+            rows = np.flatnonzero(labels == label)
+            assigned = self.assigned.setdefault(label, np.zeros(len(self.fractions), dtype=np.int64))
+            counts = allocate(len(rows), assigned, self.fractions)
+            # Si el redondeo deja filas de más o de menos, se ajusta el subconjunto más grande
+            counts[np.argmax(self.fractions)] += len(rows) - counts.sum()
+            result[self.rng.permutation(rows)] = np.repeat(np.arange(len(self.fractions)), counts)
+            assigned += counts
+        return result
+
+
+# Función para leer el CSV por bloques y escribir cada subconjunto en archivos binarios
+# (uno por grupo de columnas). Solo hay un bloque en memoria a la vez. Los archivos se
+# escriben aparte y se renombran al terminar, y el archivo de metadatos va al final
+def prepare_splits(csv_path=CSV_PATH, directory=SPLITS_DIR, chunk_rows=CHUNK_ROWS, seed=42, force=False):
+    source = source_version(csv_path)
+    meta = read_meta(directory)
+    if not force and meta is not None and meta['source'] == source and meta['seed'] == seed and meta['chunk_rows'] == chunk_rows:
+        return meta
+
+    os.makedirs(directory, exist_ok=True)
+    names = list(SPLITS)
+    files = {(split, suffix): open(split_path(directory, split, suffix) + '.tmp', 'wb') for split in names for suffix in SPLIT_FILES}
+    rows = dict.fromkeys(names, 0)
+    assigner = StratifiedAssigner(SPLITS, seed)
+    start = 0
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_rows, dtype=CSV_DTYPES):
+            missing = [col for col in CSV_DTYPES if col not in chunk.columns]
+            if missing:
+                raise ValueError(f"Faltan columnas en {csv_path}: {', '.join(missing)}")
+            arrays = {suffix: chunk[columns].to_numpy(dtype=dtype) for suffix, (columns, dtype) in SPLIT_FILES.items() if suffix != 'row.i64'}
+            arrays['row.i64'] = np.arange(start, start + len(chunk), dtype=np.int64)
+            target = assigner.assign(arrays['y.u8'][:, 0])
+            for index, split in enumerate(names):
+                mask = target == index
+                for suffix, values in arrays.items():
+                    files[split, suffix].write(np.ascontiguousarray(values[mask]).tobytes())
+                rows[split] += int(mask.sum())
+            start += len(chunk)
+    finally:
+        for f in files.values():
+            f.close()
+
+    for split, suffix in files:
+        path = split_path(directory, split, suffix)
+        os.replace(path + '.tmp', path)
+    meta = {'source': source, 'seed': seed, 'chunk_rows': chunk_rows, 'fractions': SPLITS, 'rows': rows}
+    tmp_path = os.path.join(directory, META_FILE + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(directory, META_FILE))
+    return meta
+
+
+def read_meta(directory=SPLITS_DIR):
+    path = os.path.join(directory, META_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+# Función para abrir con memory-map uno de los archivos de un subconjunto
+def open_split_file(directory, split, suffix, rows):
+    columns, dtype = SPLIT_FILES[suffix]
+    if rows == 0:
+        return np.empty((0, len(columns)), dtype=dtype)
+    return np.memmap(split_path(directory, split, suffix), dtype=dtype, mode='r', shape=(rows, len(columns)))
+
+
+# Función para abrir un subconjunto como (X, y) de pandas sin copiar los datos: X tiene
+# V1-V28 (y Time y Amount con extra=True) y el índice es la fila original del CSV
+def load_split(split, directory=SPLITS_DIR, extra=False):
+    meta = read_meta(directory)
+    if meta is None:
+        raise FileNotFoundError(f"No hay subconjuntos en {directory}; ejecute prepare_splits primero")
+    rows = meta['rows'][split]
+    index = pd.Index(open_split_file(directory, split, 'row.i64', rows)[:, 0], name='row')
+    X = pd.DataFrame(open_split_file(directory, split, 'V.f32', rows), columns=FEATURE_COLUMNS, index=index, copy=False)
+    if extra:
+        X = pd.concat([pd.DataFrame(open_split_file(directory, split, 'extra.f64', rows), columns=EXTRA_COLUMNS, index=index, copy=False), X], axis=1)
+    y = pd.Series(open_split_file(directory, split, 'y.u8', rows)[:, 0], index=index, name=LABEL_COLUMN, copy=False)
+    return X, y
+
+
+# Función para armar el conjunto completo (para explorarlo) en el orden del CSV, con las
+# mismas columnas que pd.read_csv pero con V1-V28 en float32
+def load_dataset(directory=SPLITS_DIR):
+    parts = []
+    for split in SPLITS:
+        X, y = load_split(split, directory, extra=True)
+        parts.append(X.assign(**{LABEL_COLUMN: y}))
+    df = pd.concat(parts).sort_index()
+    df.index.name = None
+    return df[['Time', *FEATURE_COLUMNS, 'Amount', LABEL_COLUMN]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Divide creditcard.csv en entrenamiento, validación y pruebas (estratificado por Class) en archivos binarios que se abren con memory-map.')
+    parser.add_argument('--csv', default=CSV_PATH, help='Ruta de creditcard.csv')
+    parser.add_argument('--dir', default=SPLITS_DIR, help='Carpeta de los subconjuntos')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_ROWS, help='Filas del CSV por bloque')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla de la asignación')
+    parser.add_argument('--force', action='store_true', help='Volver a generar aunque el CSV no haya cambiado')
+    args = parser.parse_args()
+
+    meta = prepare_splits(args.csv, args.dir, args.chunk_size, args.seed, args.force)
+    for split, rows in meta['rows'].items():
+        _, y = load_split(split, args.dir)
+        print(f"{split}: {rows} filas, {int(y.sum())} fraudes")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,5 @@
+import io
+import os
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -6,183 +8,480 @@ import folium
 import numpy as np
 import seaborn as sns
 
-#Función para cargar los datos desde la base de datos SQLite
-def load_data(year):
-    # Conectar a la base de datos SQLite
-    conn = sqlite3.connect('happiness_data.db')  # Ajusta la ruta si es necesario
-    
-    # Cambiar la consulta para la región correcta
-    latam_data = pd.read_sql_query(f"SELECT * FROM happiness_{year} WHERE Region = 'Latin America and Caribbean'", conn)
-    top_happiness_data = pd.read_sql_query(f"SELECT * FROM happiness_{year} ORDER BY Happiness_Score DESC LIMIT 6", conn)  # Limitamos a los 5 primeros países globales
-    top_happiness_data = top_happiness_data.drop(0)
-    
+from bookings import BOOKINGS_DB_PATH, WEEKDAYS, read_rollups
+from cache import data_cache, figure_cache, hash_inputs, map_cache
+from countries import CountryTable, gap_ranking
+from metrics import metrics
+from ingest import AGGREGATES_TABLE, CENTROIDS_TABLE, FACTOR_COLUMNS, HAPPINESS_TABLE, TOP_GROUP, TOP_N, VERSIONS_TABLE
+from snapshot import open_snapshot, snapshot_version
+from stats import factor_statistics
+
+# Ruta de la base de datos SQLite (relativa a este archivo para no depender del directorio de trabajo)
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'happiness_data.db')
+
+# Si existe una copia Arrow de la base de datos (snapshot.py) y corresponde a la versión
+# actual, los datos se leen de ahí con memory-map en lugar de consultar SQLite.
+# HAPPINESS_SNAPSHOT=0 obliga a leer siempre de SQLite
+USE_SNAPSHOT = os.environ.get('HAPPINESS_SNAPSHOT', '1') != '0'
+
+
+# Región de LATAM tal como aparece en el World Happiness Report
+LATAM_REGION = 'Latin America and Caribbean'
+
+# Opción del filtro de región de la vista específica para los países del Top Global
+GLOBAL_FILTER = 'Global'
+
+# Factores que se grafican para cada país y sus etiquetas cortas
+DETAIL_FACTORS = ['Economy_GDP_per_Capita', 'Family', 'Health_Life_Expectancy', 
+                  'Freedom', 'Trust_Government_Corruption', 'Generosity']
+DETAIL_LABELS = ['Economy', 'Family', 'Health', 'Freedom', 'Trust', 'Generosity']
+
+# Consultas parametrizadas sobre la tabla única de hechos (un registro por año y país).
+# Los países de un año se leen en el orden de la llave primaria (Year, Country), que es
+# un recorrido contiguo de la tabla; ordenarlos por puntaje lo hace CountryTable en memoria
+# (leerlos ordenados por el índice de puntaje obliga a una búsqueda por fila en la tabla)
+YEAR_QUERY = "SELECT * FROM happiness WHERE Year = ?"
+YEARS_QUERY = "SELECT DISTINCT Year FROM happiness ORDER BY Year"
+AGGREGATES_QUERY = f"SELECT Region, Factor, Mean, Count, Std FROM {AGGREGATES_TABLE} WHERE Year = ?"
+CENTROIDS_QUERY = f"SELECT Country, Latitude, Longitude FROM {CENTROIDS_TABLE}"
+VERSIONS_QUERY = f"SELECT Year, Version FROM {VERSIONS_TABLE}"
+
+
+# Versión de la base de datos completa: fecha de modificación y tamaño del archivo
+def file_version(db_path=DB_PATH):
+    stat = os.stat(db_path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+# Función para leer de la caché compartida un resultado derivado de la base de datos.
+# La llave incluye la versión de los datos (por defecto la del archivo completo), así que
+# si los datos cambian en disco las entradas anteriores dejan de ser válidas. El resultado
+# es un objeto compartido por todas las sesiones, que solo se lee (nunca se modifica)
+def cached_from_db(kind, loader, *args, db_path=DB_PATH, cache=data_cache, version=None):
+    key = (kind, db_path, args, version or file_version(db_path))
+
+    def load():
+        # Descartar las versiones anteriores de esta misma consulta antes de guardar la nueva
+        cache.invalidate(lambda k: k[:3] == (kind, db_path, args))
+        with metrics.stage(f'load.{kind}'):
+            return loader(*args, db_path=db_path)
+
+    value, created = cache.get_or_create(key, load)
+    metrics.count('cache', cache=kind, event='miss' if created else 'hit')
+    return value
+
+
+# Función para abrir la copia Arrow de la base de datos (None si no hay una vigente).
+# Los archivos mapeados se comparten entre sesiones a través de la caché de datos. El
+# resultado None también queda en caché: mientras no cambien la base de datos ni la
+# carpeta de la copia, no se vuelve a intentar abrirla en cada consulta
+def load_snapshot(db_path=DB_PATH):
+    if not USE_SNAPSHOT:
+        return None
+    version = (file_version(db_path), snapshot_version(db_path))
+    return cached_from_db('snapshot', open_snapshot, db_path=db_path, version=version)
+
+
+# Función para consultar todos los países de un año como tabla indexada por país
+def query_countries(year, db_path=DB_PATH):
+    snapshot = load_snapshot(db_path)
+    if snapshot is not None:
+        with metrics.stage('arrow.read'):
+            return CountryTable(snapshot.year_frame(HAPPINESS_TABLE, year))
+
+    conn = sqlite3.connect(db_path)
+    with metrics.stage('sqlite.query'):
+        df = pd.read_sql_query(YEAR_QUERY, conn, params=(year,))
     conn.close()
-    
-    # Depuración: Mostrar la cantidad de datos cargados
-    st.write(f"Datos de LATAM cargados: {latam_data.shape[0]} filas")
-    st.write(f"Datos de Top Global (5 primeros) cargados: {top_happiness_data.shape[0]} filas")
-    
-    return latam_data, top_happiness_data
+    return CountryTable(df)
+
+
+# Función para consultar los agregados por región y factor que se calculan al ingerir los datos.
+# Devuelve las medias como un DataFrame con un factor por fila y una región por columna
+def query_aggregates(year, db_path=DB_PATH):
+    snapshot = load_snapshot(db_path)
+    if snapshot is not None:
+        long_df = snapshot.year_frame(AGGREGATES_TABLE, year)
+    else:
+        conn = sqlite3.connect(db_path)
+        long_df = pd.read_sql_query(AGGREGATES_QUERY, conn, params=(year,))
+        conn.close()
+    return long_df.pivot(index='Factor', columns='Region', values='Mean').reindex(FACTOR_COLUMNS)
+
+
+# Función para consultar los años disponibles en la base de datos
+def query_years(db_path=DB_PATH):
+    snapshot = load_snapshot(db_path)
+    if snapshot is not None:
+        return list(snapshot.years[HAPPINESS_TABLE])
+
+    conn = sqlite3.connect(db_path)
+    years = [row[0] for row in conn.execute(YEARS_QUERY)]
+    conn.close()
+    return years
+
+
+# Función para consultar la versión de cada año que guarda ingest.py (vacía si la base
+# de datos es anterior a la tabla de versiones)
+def query_versions(db_path=DB_PATH):
+    conn = sqlite3.connect(db_path)
+    try:
+        versions = dict(conn.execute(VERSIONS_QUERY).fetchall())
+    except sqlite3.OperationalError:
+        versions = {}
+    conn.close()
+    return versions
+
+
+# Versión de los datos de un año. Al cargar un año nuevo o corregir uno con ingest.py
+# solo cambia la versión de ese año, así que las cachés de los demás años siguen válidas.
+# Sin tabla de versiones se usa la versión del archivo completo
+def year_version(year, db_path=DB_PATH):
+    versions = cached_from_db('versions', query_versions, db_path=db_path)
+    return (year, versions.get(year) or file_version(db_path))
+
+
+def load_aggregates(year, db_path=DB_PATH):
+    return cached_from_db('aggregates', query_aggregates, year, db_path=db_path, version=year_version(year, db_path))
+
+
+def load_countries(year, db_path=DB_PATH):
+    return cached_from_db('countries', query_countries, year, db_path=db_path, version=year_version(year, db_path))
+
+
+# Función para calcular los estadísticos y outliers de una región (None = todos los países)
+# a partir de la tabla del año que ya está en la caché
+def query_statistics(year, region, db_path=DB_PATH):
+    return factor_statistics(load_countries(year, db_path), region)
+
+
+# Los estadísticos se guardan por (año, región) con la versión del año, así cambiar de
+# región o volver a una ya vista no recalcula nada mientras el año no cambie en disco
+def load_statistics(year, region=None, db_path=DB_PATH):
+    return cached_from_db('statistics', query_statistics, year, region, db_path=db_path, version=year_version(year, db_path))
+
+
+def available_years(db_path=DB_PATH):
+    return cached_from_db('years', query_years, db_path=db_path)
+
+
+#Función para cargar los países de una región y el top global de un año. Ambos son cortes
+# de la tabla del año, que se lee una sola vez de SQLite a través de la caché compartida
+def load_data(year, db_path=DB_PATH, region=LATAM_REGION, top_n=TOP_N):
+    countries = load_countries(year, db_path)
+    return countries.top(region=region), countries.top(top_n)
+
+
+# Función para fijar en la sesión los datos del año seleccionado. Solo se vuelven a pedir
+# cuando cambia el año (o sus datos en disco); los fragmentos leen de aquí
+def pin_year_data(year, db_path=DB_PATH):
+    version = year_version(year, db_path)
+    pinned = st.session_state.get('year_data')
+    if pinned is None or pinned['version'] != version:
+        pinned = {
+            'version': version,
+            'aggregates': load_aggregates(year, db_path),
+            'countries': load_countries(year, db_path),
+        }
+        st.session_state['year_data'] = pinned
+    return pinned
+
+
+# Función para obtener los agregados con el grupo del Top Global del tamaño elegido.
+# Los agregados guardados corresponden al top de TOP_N países; para otro N la media
+# se calcula sobre los N primeros países de la tabla del año (ya ordenada)
+def top_aggregates(aggregates, countries, top_n):
+    if top_n == TOP_N:
+        return aggregates
+    return aggregates.assign(**{TOP_GROUP: countries.top_mean(top_n).reindex(aggregates.index)})
+
+
+# Nombre corto de una región para títulos y etiquetas
+def region_label(region):
+    return 'LATAM' if region == LATAM_REGION else region
 
 
 
 # Función para calcular las diferencias de felicidad y crear el DataFrame de comparación
-def calculate_comparison(latam_data, top_happiness_data):
-    factor_columns = [
-        'Happiness_Score', 
-        'Economy_GDP_per_Capita', 
-        'Family', 
-        'Health_Life_Expectancy', 
-        'Freedom', 
-        'Trust_Government_Corruption', 
-        'Generosity', 
-        'Dystopia_Residual'
-    ]
-    
-    # Calcular promedios de LATAM y top de felicidad
-    latam_avg = latam_data[factor_columns].mean()
-    top_avg = top_happiness_data[factor_columns].mean()
+@metrics.timed('calculate_comparison')
+def calculate_comparison(aggregates, region=LATAM_REGION):
+    # Promedios de la región y top de felicidad, precalculados al ingerir los datos
+    region_avg = aggregates[region]
+    top_avg = aggregates[TOP_GROUP]
 
     # Crear DataFrame comparativo
     comparison_df = pd.DataFrame({
-        'LATAM_Average': latam_avg,
+        'Region_Average': region_avg,
         'Top_Happiness_Average': top_avg
     })
-    comparison_df['Difference'] = comparison_df['Top_Happiness_Average'] - comparison_df['LATAM_Average']
-    comparison_df['Percentage_Difference'] = (comparison_df['Difference'] / comparison_df['LATAM_Average']) * 100
+    comparison_df['Difference'] = comparison_df['Top_Happiness_Average'] - comparison_df['Region_Average']
+    comparison_df['Percentage_Difference'] = (comparison_df['Difference'] / comparison_df['Region_Average']) * 100
 
     return comparison_df
 
-# Función para graficar la comparación de las diferencias
-def plot_comparison(comparison_df, year):
+# Backend de los gráficos (variable de entorno CHART_BACKEND):
+# - 'vega': se envía una especificación Vega-Lite y el navegador dibuja el gráfico, así el
+#   servidor no gasta CPU ni memoria en rasterizar imágenes por cada sesión
+# - 'matplotlib': el servidor genera una imagen PNG (también la usa export_report.py)
+CHART_BACKENDS = ['vega', 'matplotlib']
+CHART_BACKEND = os.environ.get('CHART_BACKEND', 'vega')
+
+# Resolución de las imágenes. Con 120 dpi las figuras quedan por debajo del ancho máximo
+# de Streamlit (1460 px), así st.image las envía tal cual en lugar de redimensionarlas
+FIGURE_DPI = 120
+
+
+# Función para obtener la imagen de un gráfico. La llave es el nombre de la función que
+# dibuja más una huella de sus datos de entrada, así que repetir una vista solo copia bytes
+def figure_bytes(render, *args, fmt='png'):
+    key = f'{render.__name__}-{hash_inputs(*args)}.{fmt}'
+
+    def draw():
+        with metrics.stage(f'render.{render.__name__}'):
+            fig = render(*args)
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format=fmt, dpi=FIGURE_DPI, bbox_inches='tight')
+            plt.close(fig)  # Liberar la figura; solo se guardan los bytes
+            return buffer.getvalue()
+
+    image, created = figure_cache.get_or_create(key, draw)
+    metrics.count('cache', cache='figure', event='miss' if created else 'hit')
+    return image
+
+
+# Función para mostrar en Streamlit un gráfico. Con el backend 'vega' se usa la
+# especificación equivalente a la función que dibuja (si existe); si no, la imagen
+# de matplotlib (desde la caché si ya se dibujó)
+def show_figure(render, *args):
+    spec_builder = VEGA_SPECS.get(render) if CHART_BACKEND == 'vega' else None
+    if spec_builder is not None:
+        with metrics.stage(f'spec.{spec_builder.__name__}'):
+            spec = spec_builder(*args)
+        with metrics.stage('st.vega_lite_chart'):
+            st.vega_lite_chart(spec=spec, width='stretch')
+        return
+
+    image = figure_bytes(render, *args)
+    with metrics.stage('st.image'):
+        st.image(image)
+
+
+# Función para convertir un DataFrame en los registros de una especificación Vega-Lite
+# (los valores nulos van como None para que el JSON sea válido)
+def records(df):
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+# Función para dibujar la comparación de las diferencias
+def render_comparison(comparison_df, year, label='LATAM'):
     sns.set(style="whitegrid")
-    plt.figure(figsize=(10, 6))
-    sns.barplot(x=comparison_df.index, y=comparison_df['Percentage_Difference'], palette='coolwarm')
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.barplot(x=comparison_df.index, y=comparison_df['Percentage_Difference'], hue=comparison_df.index, palette='coolwarm', legend=False, ax=ax)
     
-    plt.title(f'Diferencia Porcentual de Factores de Felicidad: LATAM vs Top Global en {year}', fontsize=16)
-    plt.xlabel('Factores', fontsize=12)
-    plt.ylabel('Diferencia Porcentual (%)', fontsize=12)
+    ax.set_title(f'Diferencia Porcentual de Factores de Felicidad: {label} vs Top Global en {year}', fontsize=16)
+    ax.set_xlabel('Factores', fontsize=12)
+    ax.set_ylabel('Diferencia Porcentual (%)', fontsize=12)
     
-    plt.xticks(rotation=45, ha="right")
-    plt.tight_layout()
-    st.pyplot(plt)
+    plt.setp(ax.get_xticklabels(), rotation=45, ha="right")
+    fig.tight_layout()
+    return fig
 
 
-# Función para mostrar mapas de LATAM y Top Global
-def display_maps(year):
-
-    if year == 2015:
-        # Coordenadas de los países LATAM y globales
-        latam_coordinates = {
-            'Costa Rica': [9.7489, -83.7534],
-            'Mexico': [23.6345, -102.5528],
-            'Brazil': [-14.2350, -51.9253],
-            'Venezuela': [6.4238, -66.5897],
-            'Panama': [8.5380, -80.7821]
-        }
-    
-        global_coordinates = {
-            'Switzerland': [46.8182, 8.2275],
-            'Iceland': [64.9631, -19.0208],
-            'Denmark': [56.2639, 9.5018],
-            'Norway': [60.4720, 8.4689],
-            'Canada': [56.1304, -106.3468]
-        }
-    else: 
-        #Paises de latam
-        latam_coordinates = {
-            'Costa Rica': [9.7489, -83.7534],
-            'Puerto Rico': [18.2208, -66.5901],
-            'Brazil': [-14.2350, -51.9253],
-            'Mexico': [23.6345, -102.5528],
-            'Chile': [-35.6751, -71.5429]
-        }
-        
-        global_coordinates = {
-            'Denmark': [56.2639, 9.5018],
-            'Iceland': [64.9631, -19.0208],
-            'Switzerland': [46.8182, 8.2275],
-            'Norway': [60.4720, 8.4689]
-        }
+# Especificación Vega-Lite equivalente a render_comparison
+def comparison_spec(comparison_df, year, label='LATAM'):
+    data = comparison_df['Percentage_Difference'].rename_axis('Factor').reset_index()
+    return {
+        'title': f'Diferencia Porcentual de Factores de Felicidad: {label} vs Top Global en {year}',
+        'height': 400,
+        'data': {'values': records(data)},
+        'mark': 'bar',
+        'encoding': {
+            'x': {'field': 'Factor', 'type': 'nominal', 'sort': None, 'title': 'Factores', 'axis': {'labelAngle': -45}},
+            'y': {'field': 'Percentage_Difference', 'type': 'quantitative', 'title': 'Diferencia Porcentual (%)'},
+            'color': {'field': 'Factor', 'type': 'nominal', 'sort': None, 'scale': {'scheme': 'redblue', 'reverse': True}, 'legend': None},
+            'tooltip': [{'field': 'Factor'}, {'field': 'Percentage_Difference', 'type': 'quantitative', 'format': '.1f'}],
+        },
+    }
+
+
+# Función para graficar la comparación de las diferencias
+def plot_comparison(comparison_df, year, label='LATAM'):
+    show_figure(render_comparison, comparison_df, year, label)
 
 
+# Función para consultar el centroide de cada país (indexado por país)
+def query_centroids(db_path=DB_PATH):
+    snapshot = load_snapshot(db_path)
+    if snapshot is not None:
+        return snapshot.table_frame(CENTROIDS_TABLE).set_index('Country')
+
+    conn = sqlite3.connect(db_path)
+    centroids = pd.read_sql_query(CENTROIDS_QUERY, conn, index_col='Country')
+    conn.close()
+    return centroids
+
+
+# Función para generar el HTML del mapa. Todos los marcadores van en una sola capa GeoJSON
+# (un único objeto de datos en el HTML) en lugar de un folium.Marker por país, así que
+# mostrar todos los países no multiplica el tamaño del HTML ni el tiempo de render
+@metrics.timed('map.html')
+def render_map_html(year, show_all, region=LATAM_REGION, top_n=TOP_N, db_path=DB_PATH):
+    countries = load_countries(year, db_path)
+    centroids = cached_from_db('centroids', query_centroids, db_path=db_path)
+
+    # Solo se buscan los centroides de los países que se dibujan. El índice de cada corte
+    # es la fila en la tabla del año, así que índice + 1 es el ranking global
+    def points(rows):
+        return rows.assign(Global_Rank=rows.index + 1).join(centroids, on='Country', how='inner')
+
+    global_top = points(countries.top(top_n))
+    region_top = points(countries.top(top_n, region))
+    region_top = region_top.assign(Region_Rank=countries.region_ranks[region_top.index])
+
+    # Los rojos son el Top Global y los azules el top de la región; el resto (si se muestran) en gris
+    features = []
+    def add_features(rows, color, rank_column, label):
+        for row in rows.itertuples():
+            features.append({
+                'type': 'Feature',
+                'id': row.Country,
+                'geometry': {'type': 'Point', 'coordinates': [row.Longitude, row.Latitude]},
+                'properties': {
+                    'popup': f"{row.Country}: #{getattr(row, rank_column)} {label} ({row.Happiness_Score:.3f})",
+                    'color': color,
+                },
+            })
+
+    add_features(global_top, 'red', 'Global_Rank', 'Global')
+    add_features(region_top[~region_top['Country'].isin(global_top['Country'])], 'blue', 'Region_Rank', f'en {region_label(region)}')
+    if show_all:
+        rest = countries.frame.drop(index=global_top.index.union(region_top.index))
+        add_features(points(rest), 'gray', 'Global_Rank', 'Global')
 
     # Crear un mapa base centrado en LATAM
     mapa = folium.Map(location=[10, -30], zoom_start=2)
+    folium.GeoJson(
+        {'type': 'FeatureCollection', 'features': features},
+        marker=folium.CircleMarker(radius=7, fill=True, fill_opacity=0.8, weight=1),
+        style_function=lambda feature: {'color': feature['properties']['color'], 'fillColor': feature['properties']['color']},
+        tooltip=folium.GeoJsonTooltip(fields=['popup'], labels=False),
+    ).add_to(mapa)
+    return mapa._repr_html_()
+
 
-    # Agregar marcadores para los países de LATAM con números
-    for idx, (country, coord) in enumerate(latam_coordinates.items(), start=1):
-        folium.Marker(
-            location=coord,
-            popup=f"<b>{country}</b>: #{idx} en LATAM",
-            icon=folium.Icon(color='blue', icon=f'{idx}')
-        ).add_to(mapa)
-
-    # Agregar marcadores para los países globales con números
-    for idx, (country, coord) in enumerate(global_coordinates.items(), start=1):
-        folium.Marker(
-            location=coord,
-            popup=f"<b>{country}</b>: #{idx} Global",
-            icon=folium.Icon(color='red', icon=f'{idx}')
-        ).add_to(mapa)
+# Función para mostrar mapas de LATAM y Top Global
+def display_maps(year, show_all=False, region=LATAM_REGION, top_n=TOP_N, db_path=DB_PATH):
+    # El HTML de cada (año, selección) se genera una sola vez y se sirve desde memoria
+    map_html = cached_from_db('map', render_map_html, year, show_all, region, top_n, db_path=db_path, cache=map_cache,
+                              version=year_version(year, db_path))
 
     # Mostrar el mapa interactivo
     st.write(f"### Paises más felices en {year}")
     #Quiero que sea el color con el label representando
-    st.markdown("""
+    st.markdown(f"""
     <div style="background-color: red; padding: 10px; font-size: 16px; color: white; text-align: center;">
         Rojos = Top Global
     </div>
     <div style="background-color: blue; padding: 10px; font-size: 16px; color: white; text-align: center;">
-        Azules = Top Latam
+        Azules = Top {region_label(region)}
     </div>
     """, unsafe_allow_html=True)
-    st.components.v1.html(mapa._repr_html_(), height=500)
+    with metrics.stage('st.html'):
+        st.components.v1.html(map_html, height=500)
 
-def plot_happiness_comparison(latam_data, top_happiness_data):
-    # Concatenar los datos de LATAM y Top Global
-    latam_top_countries = latam_data.nlargest(5, 'Happiness_Score')[['Country', 'Happiness_Score']]
-    global_top_countries = top_happiness_data[['Country', 'Happiness_Score']].head(5)
-
-    # Añadir una columna para la región (LATAM o Global) para diferenciarlos
-    latam_top_countries['Region'] = 'LATAM'
-    global_top_countries['Region'] = 'Top Global'
-    
-    # Unir los DataFrames de LATAM y Top Global
-    comparison_data = pd.concat([latam_top_countries, global_top_countries], axis=0)
-    
-    # Graficar
-    plt.figure(figsize=(12, 6))
+# Función para dibujar el Happiness Score de los países de LATAM y del Top Global
+def render_happiness_comparison(comparison_data, label='LATAM'):
+    fig, ax = plt.subplots(figsize=(12, 6))
     
     # Usar un color diferente para LATAM y Top Global
-    sns.barplot(data=comparison_data, x='Country', y='Happiness_Score', hue='Region', palette=["orange", "purple"])
+    sns.barplot(data=comparison_data, x='Country', y='Happiness_Score', hue='Region', palette=["orange", "purple"], ax=ax)
     
     # Título y etiquetas
-    plt.title('Comparación de Happiness Score entre LATAM y el Top Global', fontsize=14)
-    plt.ylabel('Happiness Score', fontsize=12)
-    plt.xticks(rotation=45, ha="right", fontsize=10)
+    ax.set_title(f'Comparación de Happiness Score entre {label} y el Top Global', fontsize=14)
+    ax.set_ylabel('Happiness Score', fontsize=12)
+    plt.setp(ax.get_xticklabels(), rotation=45, ha="right", fontsize=10)
+    return fig
+
+
+# Especificación Vega-Lite equivalente a render_happiness_comparison
+def happiness_comparison_spec(comparison_data, label='LATAM'):
+    return {
+        'title': f'Comparación de Happiness Score entre {label} y el Top Global',
+        'height': 400,
+        'data': {'values': records(comparison_data)},
+        'mark': 'bar',
+        'encoding': {
+            'x': {'field': 'Country', 'type': 'nominal', 'sort': None, 'axis': {'labelAngle': -45}},
+            'xOffset': {'field': 'Region'},
+            'y': {'field': 'Happiness_Score', 'type': 'quantitative', 'title': 'Happiness Score'},
+            'color': {'field': 'Region', 'type': 'nominal', 'sort': None, 'scale': {'range': ['orange', 'purple']}},
+            'tooltip': [{'field': 'Country'}, {'field': 'Region'}, {'field': 'Happiness_Score', 'type': 'quantitative', 'format': '.3f'}],
+        },
+    }
+
+
+# Función para armar los datos del gráfico de barras de Happiness Score a partir de los
+# tops (ya ordenados) de la región y global
+def happiness_comparison_data(region_top, global_top, label='LATAM'):
+    # Concatenar los datos de la región y Top Global
+    region_top_countries = region_top[['Country', 'Happiness_Score']].assign(Region=label)
+    global_top_countries = global_top[['Country', 'Happiness_Score']].assign(Region='Top Global')
+    
+    # Unir los DataFrames de la región y Top Global
+    return pd.concat([region_top_countries, global_top_countries], axis=0)
+
+
+def plot_happiness_comparison(region_top, global_top, label='LATAM'):
+    comparison_data = happiness_comparison_data(region_top, global_top, label)
     
-    # Mostrar el gráfico
-    st.pyplot(plt)
+    # Graficar
+    show_figure(render_happiness_comparison, comparison_data, label)
+
+
+
 
+# Función para dibujar el heatmap de factores
+def render_factor_heatmap(comparison_df):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.heatmap(comparison_df.T, annot=True, cmap='coolwarm', center=0, ax=ax)
+    ax.set_title(f'Comparación de Factores de Felicidad entre {comparison_df.columns[0]} y Top Global')
+    return fig
 
 
+# Especificación Vega-Lite equivalente a render_factor_heatmap
+def factor_heatmap_spec(comparison_df):
+    data = comparison_df.rename_axis('Factor').reset_index().melt(id_vars='Factor', var_name='Grupo', value_name='Valor')
+    return {
+        'title': f'Comparación de Factores de Felicidad entre {comparison_df.columns[0]} y Top Global',
+        'height': 200,
+        'data': {'values': records(data)},
+        'encoding': {
+            'x': {'field': 'Factor', 'type': 'nominal', 'sort': None, 'axis': {'labelAngle': -45}},
+            'y': {'field': 'Grupo', 'type': 'nominal', 'sort': None, 'title': None},
+        },
+        'layer': [
+            {'mark': 'rect', 'encoding': {'color': {'field': 'Valor', 'type': 'quantitative',
+                                                    'scale': {'scheme': 'redblue', 'reverse': True, 'domainMid': 0}}}},
+            {'mark': 'text', 'encoding': {'text': {'field': 'Valor', 'type': 'quantitative', 'format': '.2f'}}},
+        ],
+    }
 
-def plot_factor_comparison_heatmap(latam_data, top_happiness_data):
-    # Calcular la media de los factores para LATAM y Top Global
-    latam_avg = latam_data[['Economy_GDP_per_Capita', 'Family', 'Health_Life_Expectancy', 
-                            'Freedom', 'Trust_Government_Corruption', 'Generosity']].mean()
-    top_avg = top_happiness_data[['Economy_GDP_per_Capita', 'Family', 'Health_Life_Expectancy', 
-                                  'Freedom', 'Trust_Government_Corruption', 'Generosity']].mean()
+
+# Función para armar los datos del heatmap de factores
+def factor_heatmap_data(aggregates, region=LATAM_REGION):
+    # Media de los factores para la región y Top Global (precalculada)
+    region_avg = aggregates.loc[DETAIL_FACTORS, region]
+    top_avg = aggregates.loc[DETAIL_FACTORS, TOP_GROUP]
     
     # Crear el DataFrame de comparación
-    comparison_df = pd.DataFrame({
-        'LATAM': latam_avg,
+    return pd.DataFrame({
+        region_label(region): region_avg,
         'Top Global': top_avg
     })
-    
-    # Asegurarse de que los datos sean numéricos
-    comparison_df = comparison_df.apply(pd.to_numeric, errors='coerce')
+
+
+def plot_factor_comparison_heatmap(aggregates, region=LATAM_REGION):
+    comparison_df = factor_heatmap_data(aggregates, region)
     
     # Verificar si hay valores nulos y manejarlos
     if comparison_df.isnull().values.any():
@@ -190,52 +489,241 @@ def plot_factor_comparison_heatmap(latam_data, top_happiness_data):
         comparison_df = comparison_df.fillna(0)  # Llenar los valores nulos con 0 o con el valor que consideres adecuado
     
     # Graficar el heatmap
-    plt.figure(figsize=(10, 6))
-    sns.heatmap(comparison_df.T, annot=True, cmap='coolwarm', center=0)
-    plt.title('Comparación de Factores de Felicidad entre LATAM y Top Global')
-    st.pyplot(plt)
+    show_figure(render_factor_heatmap, comparison_df)
 
-# Función para mostrar gráficos específicos de cada país
-def plot_specific_country_analysis(latam_data, top_happiness_data, year, country_filter, region_filter):
-    # Filtrar datos del país seleccionado
-    country_data = latam_data[latam_data['Country'] == country_filter] if region_filter == 'LATAM' else top_happiness_data[top_happiness_data['Country'] == country_filter]
-
-    # Si el país está en LATAM, se compara con el top global
-    if region_filter == 'LATAM':
-        # Extraemos las primeras 5 variables de interés para la comparación
-        latam_factors = country_data[['Economy_GDP_per_Capita', 'Family', 'Health_Life_Expectancy', 
-                                      'Freedom', 'Trust_Government_Corruption', 'Generosity']].values.flatten()
-        
-        # Promedio global para comparar
-        top_avg = top_happiness_data[['Economy_GDP_per_Capita', 'Family', 'Health_Life_Expectancy', 
-                                      'Freedom', 'Trust_Government_Corruption', 'Generosity']].mean().values.flatten()
-        
-        # Configuración del gráfico con barras separadas
-        fig, ax = plt.subplots(figsize=(10, 6))
-    
-        # Definir los colores con alta diferencia
-        color_latam = 'orange'
-        color_top_global = 'purple'
-        
-        # Barras para LATAM
-        ax.barh(['Economy', 'Family', 'Health', 'Freedom', 'Trust', 'Generosity'], latam_factors, 
-                color=color_latam, alpha=0.7, label=f'LATAM: {country_filter}', edgecolor='black', height=0.4)
-        
-        # Barras para Top Global
-        ax.barh(['Economy', 'Family', 'Health', 'Freedom', 'Trust', 'Generosity'], top_avg, 
-                color=color_top_global, alpha=0.7, label='Top Global', edgecolor='black', height=0.4, left=latam_factors)
-    
-        # Mejorar la legibilidad del gráfico
-        ax.set_xlabel('Happiness Score', fontsize=12)
-        ax.set_title(f'Comparación de Factores de Felicidad: {country_filter} vs Top Global ({year})', fontsize=14)
-        ax.legend()
+# Función para dibujar los factores de un país de LATAM frente al promedio del Top Global
+def render_latam_country_factors(latam_factors, top_avg, country_filter, year, label='LATAM'):
+    # Configuración del gráfico con barras separadas
+    fig, ax = plt.subplots(figsize=(10, 6))
+
+    # Definir los colores con alta diferencia
+    color_latam = 'orange'
+    color_top_global = 'purple'
     
-        # Ajustar tamaño de los ticks para mejor legibilidad
-        plt.xticks(fontsize=10)
-        plt.yticks(fontsize=10)
+    # Barras para LATAM
+    ax.barh(DETAIL_LABELS, latam_factors, 
+            color=color_latam, alpha=0.7, label=f'{label}: {country_filter}', edgecolor='black', height=0.4)
     
-        st.pyplot(fig)
-        
+    # Barras para Top Global
+    ax.barh(DETAIL_LABELS, top_avg, 
+            color=color_top_global, alpha=0.7, label='Top Global', edgecolor='black', height=0.4, left=latam_factors)
+
+    # Mejorar la legibilidad del gráfico
+    ax.set_xlabel('Happiness Score', fontsize=12)
+    ax.set_title(f'Comparación de Factores de Felicidad: {country_filter} vs Top Global ({year})', fontsize=14)
+    ax.legend()
+
+    # Ajustar tamaño de los ticks para mejor legibilidad
+    ax.tick_params(labelsize=10)
+    return fig
+
+
+# Especificación Vega-Lite equivalente a render_latam_country_factors (barras apiladas)
+def latam_country_factors_spec(latam_factors, top_avg, country_filter, year, label='LATAM'):
+    groups = [f'{label}: {country_filter}', 'Top Global']
+    data = pd.DataFrame({
+        'Factor': DETAIL_LABELS * 2,
+        'Grupo': np.repeat(groups, len(DETAIL_LABELS)),
+        'Orden': np.repeat([0, 1], len(DETAIL_LABELS)),
+        'Valor': np.concatenate([latam_factors, top_avg]).astype(float),
+    })
+    return {
+        'title': f'Comparación de Factores de Felicidad: {country_filter} vs Top Global ({year})',
+        'height': 300,
+        'data': {'values': records(data)},
+        'mark': {'type': 'bar', 'opacity': 0.7, 'stroke': 'black'},
+        'encoding': {
+            'y': {'field': 'Factor', 'type': 'nominal', 'sort': None, 'title': None},
+            'x': {'field': 'Valor', 'type': 'quantitative', 'stack': 'zero', 'title': 'Happiness Score'},
+            'color': {'field': 'Grupo', 'type': 'nominal', 'sort': groups, 'scale': {'domain': groups, 'range': ['orange', 'purple']}},
+            'order': {'field': 'Orden'},
+            'tooltip': [{'field': 'Grupo'}, {'field': 'Factor'}, {'field': 'Valor', 'type': 'quantitative', 'format': '.3f'}],
+        },
+    }
+
+
+# Función para dibujar los factores de un país del Top Global
+def render_top_country_factors(global_factors, country_filter, year):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.barh(DETAIL_LABELS, global_factors, color='green', alpha=0.6, label=f'{country_filter} (Top Global)')
+    ax.set_xlabel('Score')
+    ax.set_title(f'Factores Clave de Felicidad en {country_filter} ({year}) - Top Global')
+    ax.legend()
+    return fig
+
+
+# Especificación Vega-Lite equivalente a render_top_country_factors
+def top_country_factors_spec(global_factors, country_filter, year):
+    data = pd.DataFrame({'Factor': DETAIL_LABELS, 'Valor': np.asarray(global_factors, dtype=float)})
+    return {
+        'title': f'Factores Clave de Felicidad en {country_filter} ({year}) - Top Global',
+        'height': 300,
+        'data': {'values': records(data)},
+        'mark': {'type': 'bar', 'color': 'green', 'opacity': 0.6},
+        'encoding': {
+            'y': {'field': 'Factor', 'type': 'nominal', 'sort': None, 'title': None},
+            'x': {'field': 'Valor', 'type': 'quantitative', 'title': 'Score'},
+            'tooltip': [{'field': 'Factor'}, {'field': 'Valor', 'type': 'quantitative', 'format': '.3f'}],
+        },
+    }
+
+
+# Medidas de la página de reservas (etiqueta -> columna de los totales) y dimensiones
+# que se grafican con su etiqueta
+BOOKING_MEASURES = {'Reservas': 'Bookings', 'Horas reservadas': 'Hours'}
+BOOKING_DIMENSIONS = {'Staff': 'Monitor', 'Service': 'Servicio', 'Location': 'Lugar'}
+
+# Cantidad máxima de barras por gráfico de reservas
+BOOKINGS_TOP = 15
+
+
+# Función para dibujar las reservas por monitor, servicio o lugar (barras horizontales).
+# data tiene la columna Name y una columna con la medida, ya ordenadas de mayor a menor
+def render_bookings_bars(data, label):
+    measure = data.columns[1]
+    fig, ax = plt.subplots(figsize=(10, max(3, 0.4 * len(data))))
+    ax.barh(data['Name'], data[measure], color='steelblue')
+    ax.invert_yaxis()
+    ax.set_xlabel(measure)
+    ax.set_title(f'{measure} por {label.lower()}')
+    fig.tight_layout()
+    return fig
+
+
+# Especificación Vega-Lite equivalente a render_bookings_bars
+def bookings_bars_spec(data, label):
+    measure = data.columns[1]
+    return {
+        'title': f'{measure} por {label.lower()}',
+        'height': max(120, 25 * len(data)),
+        'data': {'values': records(data.rename(columns={measure: 'Valor'}))},
+        'mark': {'type': 'bar', 'color': 'steelblue'},
+        'encoding': {
+            'y': {'field': 'Name', 'type': 'nominal', 'sort': None, 'title': label},
+            'x': {'field': 'Valor', 'type': 'quantitative', 'title': measure},
+            'tooltip': [{'field': 'Name', 'title': label}, {'field': 'Valor', 'type': 'quantitative', 'title': measure, 'format': '.1f'}],
+        },
+    }
+
+
+# Función para dibujar la ocupación por día de la semana y hora
+def render_bookings_heatmap(data):
+    measure = data.columns[-1]
+    table = data.pivot(index='Weekday', columns='Hour', values=measure)
+    table = table.reindex([day for day in WEEKDAYS if day in table.index]).fillna(0)
+    fig, ax = plt.subplots(figsize=(10, 4))
+    sns.heatmap(table, annot=True, fmt='.0f', cmap='Blues', cbar_kws={'label': measure}, ax=ax)
+    ax.set_xlabel('Hora')
+    ax.set_ylabel('')
+    ax.set_title(f'{measure} por día y hora')
+    return fig
+
+
+# Especificación Vega-Lite equivalente a render_bookings_heatmap
+def bookings_heatmap_spec(data):
+    measure = data.columns[-1]
+    return {
+        'title': f'{measure} por día y hora',
+        'height': 220,
+        'data': {'values': records(data.rename(columns={measure: 'Valor'}))},
+        'encoding': {
+            'x': {'field': 'Hour', 'type': 'ordinal', 'title': 'Hora'},
+            'y': {'field': 'Weekday', 'type': 'nominal', 'sort': WEEKDAYS, 'title': None},
+        },
+        'layer': [
+            {'mark': 'rect', 'encoding': {'color': {'field': 'Valor', 'type': 'quantitative', 'title': measure, 'scale': {'scheme': 'blues'}}}},
+            {'mark': 'text', 'encoding': {'text': {'field': 'Valor', 'type': 'quantitative', 'format': '.0f'}}},
+        ],
+    }
+
+
+# Factores del diagrama de cajas (Happiness_Score tiene otra escala y se ve en la tabla)
+BOXPLOT_FACTORS = [factor for factor in FACTOR_COLUMNS if factor != 'Happiness_Score']
+
+
+# Función para dibujar las cajas de cada factor a partir de los estadísticos ya calculados
+# (cuartiles, mediana y bigotes de FactorStats.box_summary, sin volver a calcular
+# cuantiles); los puntos son los outliers
+def render_factor_boxplot(summary, outliers, label):
+    boxes = [{
+        'label': factor,
+        'med': row['Mediana'], 'q1': row['Q1'], 'q3': row['Q3'],
+        'whislo': row['Bigote inferior'], 'whishi': row['Bigote superior'],
+        'fliers': outliers.loc[outliers['Factor'] == factor, 'Valor'].to_numpy(),
+    } for factor, row in summary.iterrows()]
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.bxp(boxes, orientation='horizontal', showfliers=True)
+    ax.invert_yaxis()
+    ax.set_xlabel('Valor')
+    ax.set_title(f'Distribución de los factores ({label})')
+    ax.grid(axis='x', linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    return fig
+
+
+# Especificación Vega-Lite equivalente a render_factor_boxplot
+def factor_boxplot_spec(summary, outliers, label):
+    boxes = records(summary.reset_index().rename(columns={'Mediana': 'Median', 'Bigote inferior': 'Lower', 'Bigote superior': 'Upper'}))
+    y = {'field': 'Factor', 'type': 'nominal', 'sort': None, 'title': None}
+    return {
+        'title': f'Distribución de los factores ({label})',
+        'height': 40 * len(summary),
+        'layer': [
+            {'data': {'values': boxes}, 'mark': 'rule', 'encoding': {'y': y, 'x': {'field': 'Lower', 'type': 'quantitative', 'title': 'Valor'}, 'x2': {'field': 'Upper'}}},
+            {'data': {'values': boxes}, 'mark': {'type': 'bar', 'size': 20, 'color': 'lightsteelblue', 'stroke': 'black'}, 'encoding': {'y': y, 'x': {'field': 'Q1', 'type': 'quantitative'}, 'x2': {'field': 'Q3'}}},
+            {'data': {'values': boxes}, 'mark': {'type': 'tick', 'color': 'black', 'size': 20}, 'encoding': {'y': y, 'x': {'field': 'Median', 'type': 'quantitative'}}},
+            {'data': {'values': records(outliers)}, 'mark': {'type': 'point', 'color': 'firebrick'},
+             'encoding': {'y': y, 'x': {'field': 'Valor', 'type': 'quantitative'}, 'tooltip': ['Country', 'Factor', {'field': 'Valor', 'format': '.3f'}]}},
+        ],
+    }
+
+
+# Especificación Vega-Lite de cada función que dibuja con matplotlib
+VEGA_SPECS = {
+    render_comparison: comparison_spec,
+    render_happiness_comparison: happiness_comparison_spec,
+    render_factor_heatmap: factor_heatmap_spec,
+    render_latam_country_factors: latam_country_factors_spec,
+    render_top_country_factors: top_country_factors_spec,
+    render_bookings_bars: bookings_bars_spec,
+    render_bookings_heatmap: bookings_heatmap_spec,
+    render_factor_boxplot: factor_boxplot_spec,
+}
+
+
+# Función para obtener los países que se pueden elegir en cada región
+def country_options(countries, region_filter, region=LATAM_REGION, top_n=TOP_N):
+    # Si se selecciona la región, mostramos sus 2N países más felices (10 con el top de 5)
+    if region_filter != GLOBAL_FILTER:
+        return countries.top(2 * top_n, region)['Country'].tolist()
+    return countries.top(top_n)['Country'].tolist()
+
+
+# Función para obtener los datos del país seleccionado (búsqueda directa en el índice del año)
+def select_country(countries, country_filter):
+    return countries.country(country_filter)
+
+
+# Función para elegir el gráfico de un país: devuelve la función que lo dibuja y sus argumentos
+def country_figure(country_data, aggregates, year, country_filter, region_filter):
+    # Si el país está en la región, se compara con el promedio (precalculado) del top global
+    if region_filter != GLOBAL_FILTER:
+        latam_factors = country_data[DETAIL_FACTORS].values.flatten()
+        top_avg = aggregates.loc[DETAIL_FACTORS, TOP_GROUP].values
+        return render_latam_country_factors, (latam_factors, top_avg, country_filter, year, region_filter)
+
+    # Si el país está en el top global, se muestran sus propias puntuaciones
+    global_factors = country_data[DETAIL_FACTORS].values.flatten()
+    return render_top_country_factors, (global_factors, country_filter, year)
+
+
+# Función para mostrar gráficos específicos de cada país
+def plot_specific_country_analysis(country_data, aggregates, year, country_filter, region_filter):
+    render, args = country_figure(country_data, aggregates, year, country_filter, region_filter)
+    show_figure(render, *args)
+
+    # Si el país está en la región, se compara con el top global
+    if region_filter != GLOBAL_FILTER:
         # Explicación de las diferencias clave
         st.write(f"### Análisis de las Diferencias Clave: {country_filter} vs Top Global ({year})")
         st.write(f"""
@@ -247,18 +735,6 @@ def plot_specific_country_analysis(latam_data, top_happiness_data, year, country
     
     # Si el país está en el top global, resaltar qué lo hace estar en el top
     else:
-        # Extraemos las puntuaciones del país en los factores de felicidad
-        global_factors = country_data[['Economy_GDP_per_Capita', 'Family', 'Health_Life_Expectancy', 
-                                       'Freedom', 'Trust_Government_Corruption', 'Generosity']].values.flatten()
-
-        # Gráfico de barras comparativo
-        fig, ax = plt.subplots(figsize=(10, 6))
-        ax.barh(['Economy', 'Family', 'Health', 'Freedom', 'Trust', 'Generosity'], global_factors, color='green', alpha=0.6, label=f'{country_filter} (Top Global)')
-        ax.set_xlabel('Score')
-        ax.set_title(f'Factores Clave de Felicidad en {country_filter} ({year}) - Top Global')
-        ax.legend()
-        st.pyplot(fig)
-        
         # Mostrar explicaciones sobre lo que hace al país estar en el top
         st.write(f"### Análisis de Factores Clave: {country_filter} ({year}) - Top Global")
         st.write("""
@@ -268,7 +744,157 @@ def plot_specific_country_analysis(latam_data, top_happiness_data, year, country
 
 
 
+
+# Fragmento con la vista de un país. Al cambiar de país solo se vuelve a ejecutar este
+# fragmento (tabla y gráfico del país), no el script completo ni la carga de datos
+@st.fragment
+def country_view(year, region_filter, region=LATAM_REGION, top_n=TOP_N):
+    pinned = pin_year_data(year)
+    countries = pinned['countries']
+    top_latam_countries = country_options(countries, region_filter, region, top_n)
+
+    # Si no hay países disponibles, mostramos un mensaje de error
+    if not top_latam_countries:
+        st.error("No hay países disponibles para la selección en la región elegida.")
+        return
+    
+    country_filter = st.selectbox('Seleccionar un país', top_latam_countries)
+    
+    # Muestra los datos del país seleccionado
+    country_data = select_country(pinned['countries'], country_filter)
     
+    st.write(f'**Datos para {country_filter} ({year}):**')
+    st.write(country_data)
+
+    own_region = countries.region_of(country_filter)
+    st.write(f"Posición global: **#{countries.rank(country_filter)}** de {len(countries)} "
+             f"(percentil {countries.percentile(country_filter):.0f}) · "
+             f"Posición en {own_region}: **#{countries.rank(country_filter, own_region)}** "
+             f"(percentil {countries.percentile(country_filter, own_region):.0f})")
+
+    aggregates = top_aggregates(pinned['aggregates'], countries, top_n)
+    plot_specific_country_analysis(country_data, aggregates, year, country_filter, region_filter)
+
+
+# Fragmento de "Información Específica": el cambio de región solo vuelve a ejecutar
+# este fragmento (y el del país que contiene)
+@st.fragment
+def specific_info_view(year, region=LATAM_REGION, top_n=TOP_N):
+    # Filtro de región (la región elegida o Global)
+    region_filter = st.selectbox('Seleccionar Región', [region_label(region), GLOBAL_FILTER])
+    country_view(year, region_filter, region, top_n)
+
+
+# Fragmento con el ranking de todos los países según su brecha frente a un grupo de
+# referencia. Las brechas de todos los países se calculan en una sola operación matricial
+@st.fragment
+def ranking_view(year, top_n=TOP_N):
+    pinned = pin_year_data(year)
+    countries = pinned['countries']
+    aggregates = top_aggregates(pinned['aggregates'], countries, top_n)
+
+    groups = [TOP_GROUP] + sorted(region for region in aggregates.columns if region != TOP_GROUP)
+    reference = st.selectbox('Grupo de referencia', groups)
+    sort_factor = st.selectbox('Ordenar por brecha en', FACTOR_COLUMNS)
+    regions = st.multiselect('Filtrar regiones', sorted(set(countries.regions)))
+
+    ranking = gap_ranking(countries, aggregates, reference)
+    if regions:
+        ranking = ranking[ranking['Region'].isin(regions)]
+    ranking = ranking.sort_values(f'Brecha_{sort_factor}', ascending=False)
+
+    st.write(f"Brecha = promedio de **{reference}** - valor del país. Los países con brecha positiva están por debajo del grupo de referencia.")
+    st.dataframe(ranking.round(3))
+
+
+# Función para armar los outliers de los factores del diagrama en formato largo (país, factor, valor)
+def boxplot_outliers(stats):
+    frames = [stats.outlier_countries(factor).rename(columns={factor: 'Valor'}).assign(Factor=factor) for factor in BOXPLOT_FACTORS]
+    return pd.concat(frames, ignore_index=True)[['Country', 'Factor', 'Valor']]
+
+
+# Fragmento de "Estadísticas": medidas de tendencia central, dispersión y outliers (regla
+# del rango intercuartílico) de cada factor, para todos los países o para una región
+@st.fragment
+def statistics_view(year, region=LATAM_REGION):
+    countries = pin_year_data(year)['countries']
+    groups = [GLOBAL_FILTER] + sorted(countries.region_rows)
+    group = st.selectbox('Grupo de países', groups, index=groups.index(region) if region in groups else 0)
+    label = region_label(group)
+    stats = load_statistics(year, None if group == GLOBAL_FILTER else group)
+
+    st.write(f"**Estadísticos descriptivos de {label} ({year}, {len(stats)} países):**")
+    st.dataframe(stats.summary.round(4))
+    show_figure(render_factor_boxplot, stats.box_summary(BOXPLOT_FACTORS), boxplot_outliers(stats), label)
+
+    factor = st.selectbox('Outliers del factor', FACTOR_COLUMNS)
+    outliers, lower, upper = stats.detect_outliers(factor)
+    st.write(f"Límites: [{lower:.4f}, {upper:.4f}] · Número de outliers: **{len(outliers)}**")
+    if not outliers.empty:
+        st.dataframe(outliers)
+
+
+# Función para leer los totales de reservas. Son tablas pequeñas que mantiene
+# bookings.py al cargar cada exportación, así la página no agrupa las reservas en cada rerun
+def load_booking_rollups(db_path=BOOKINGS_DB_PATH):
+    return cached_from_db('booking_rollups', read_rollups, db_path=db_path)
+
+
+def plot_bookings_bars(totals, label, measure_label):
+    measure = BOOKING_MEASURES[measure_label]
+    data = totals.nlargest(BOOKINGS_TOP, measure)[['Name', measure]].rename(columns={measure: measure_label})
+    show_figure(render_bookings_bars, data, label)
+
+
+def plot_bookings_heatmap(totals, measure_label):
+    measure = BOOKING_MEASURES[measure_label]
+    show_figure(render_bookings_heatmap, totals[['Weekday', 'Hour', measure]].rename(columns={measure: measure_label}))
+
+
+# Fragmento de la página de reservas de monitorías: cambiar la medida solo vuelve a
+# ejecutar este fragmento
+@st.fragment
+def bookings_view(db_path=BOOKINGS_DB_PATH):
+    rollups = load_booking_rollups(db_path) if os.path.exists(db_path) else {}
+    if 'Hour' not in rollups:
+        st.info('Todavía no hay reservas cargadas. Cárguelas con `python bookings.py`.')
+        return
+
+    totals = rollups['Hour'][['Bookings', 'Hours']].sum()
+    columns = st.columns(3)
+    columns[0].metric('Reservas', int(totals['Bookings']))
+    columns[1].metric('Horas reservadas', f"{totals['Hours']:.1f}")
+    columns[2].metric('Monitores', len(rollups['Staff']))
+
+    measure_label = st.radio('Medida', list(BOOKING_MEASURES), horizontal=True)
+    for dimension, label in BOOKING_DIMENSIONS.items():
+        plot_bookings_bars(rollups[dimension], label, measure_label)
+    plot_bookings_heatmap(rollups['Hour'], measure_label)
+
+
+# El panel de métricas es opcional: se activa con ?debug=1 en la URL o HAPPINESS_DEBUG=1
+def debug_enabled():
+    return os.environ.get('HAPPINESS_DEBUG') == '1' or st.query_params.get('debug') == '1'
+
+
+# Función para mostrar en la barra lateral los tiempos por etapa y el estado de las cachés
+def show_debug_panel():
+    with st.sidebar.expander('Métricas de rendimiento', expanded=True):
+        stages = pd.DataFrame(metrics.stage_summary())
+        if not stages.empty:
+            for col in ['mean', 'p50', 'p95', 'p99', 'max']:
+                stages[col] = stages[col] * 1000
+            st.write('Tiempos por etapa (ms)')
+            st.dataframe(stages.drop(columns='sum').set_index('stage').round(2))
+
+        caches = {'datos': data_cache, 'gráficos': figure_cache, 'mapas': map_cache}
+        st.write('Cachés')
+        st.dataframe(pd.DataFrame([{'caché': name, **cache.stats()} for name, cache in caches.items()]).set_index('caché'))
+
+        st.download_button('Descargar JSON lines', metrics.to_json_lines(), file_name='metrics.jsonl')
+        st.download_button('Descargar Prometheus', metrics.to_prometheus(), file_name='metrics.prom')
+
+
 def main():
     # Título de la aplicación
     st.title('Análisis de Felicidad en LATAM y el Mundo')
@@ -280,71 +906,72 @@ def main():
     """)
     
     # Filtro de año
-    year = st.sidebar.selectbox('Seleccionar Año', [2015, 2016])
+    year = st.sidebar.selectbox('Seleccionar Año', available_years())
+    
+    # Cargar datos según el año seleccionado (quedan fijados en la sesión)
+    pinned = pin_year_data(year)
+    countries = pinned['countries']
+
+    # Región a comparar con el Top Global y tamaño de los tops (N)
+    regions = sorted(countries.region_rows)
+    region = st.sidebar.selectbox('Región a comparar', regions, index=regions.index(LATAM_REGION) if LATAM_REGION in regions else 0)
+    top_n = st.sidebar.slider('Tamaño del Top (N)', min_value=1, max_value=20, value=TOP_N)
+    label = region_label(region)
+
+    # Los tops salen de la tabla del año ya ordenada (sin volver a ordenar en cada rerun)
+    region_data = countries.top(region=region)
+    region_top, global_top = countries.top(top_n, region), countries.top(top_n)
+    aggregates = top_aggregates(pinned['aggregates'], countries, top_n)
     
-    # Cargar datos según el año seleccionado
-    latam_data, top_happiness_data = load_data(year)
+    # Depuración: Mostrar la cantidad de datos cargados
+    st.write(f"Datos de {label} cargados: {region_data.shape[0]} filas")
+    st.write(f"Datos de Top Global ({top_n} primeros) cargados: {global_top.shape[0]} filas")
     
     # Verificación de los datos cargados
-    if latam_data.empty:
-        st.error("No se encontraron datos para LATAM en el año seleccionado.")
+    if region_data.empty:
+        st.error(f"No se encontraron datos para {label} en el año seleccionado.")
     
     # Filtro de "Información General" o "Específica"
-    info_filter = st.sidebar.selectbox('Seleccionar tipo de información', ['Información General', 'Información Específica'])
+    info_filter = st.sidebar.selectbox('Seleccionar tipo de información', ['Información General', 'Información Específica', 'Ranking de Países', 'Estadísticas', 'Reservas de Monitorías'])
     
     # Si se selecciona "Información Específica"
     if info_filter == 'Información Específica':
-        # Filtro de región (LATAM o Global)
-        region_filter = st.sidebar.selectbox('Seleccionar Región', ['LATAM', 'Global'])
+        # Los filtros de región y país viven dentro de fragmentos (en el cuerpo de la página,
+        # porque un fragmento no puede escribir widgets en la barra lateral)
+        st.header('Filtros de Selección')
+        specific_info_view(year, region, top_n)
 
-        # Filtros de selección de países
-        st.sidebar.header('Filtros de Selección')
-        
-        # Si se selecciona LATAM, solo mostramos los primeros 5 países más felices de LATAM
-        if region_filter == 'LATAM':
-            if not latam_data.empty:  # Verificamos que haya datos
-                top_latam_countries = latam_data.nlargest(10, 'Happiness_Score')['Country'].tolist()
-            else:
-                top_latam_countries = []
-        else:
-            if not top_happiness_data.empty:  # Verificamos que haya datos
-                top_latam_countries = top_happiness_data['Country'].tolist()
-            else:
-                top_latam_countries = []
-
-        # Si no hay países disponibles, mostramos un mensaje de error
-        if not top_latam_countries:
-            st.error("No hay países disponibles para la selección en la región elegida.")
-            return
-        
-        country_filter = st.sidebar.selectbox('Seleccionar un país', top_latam_countries)
-        st.sidebar.markdown('---')
-        
-        # Muestra los datos del país seleccionado
-        country_data = latam_data[latam_data['Country'] == country_filter] if region_filter == 'LATAM' else top_happiness_data[top_happiness_data['Country'] == country_filter]
-        
-        st.write(f'**Datos para {country_filter} ({year}):**')
-        st.write(country_data)
+        # Mostrar graficos especificos para cada pais, para los de latam mostrar comparaciones de por que les ganan los del top global, y para los del top globar resaltar que los hace estar en el top
 
-        plot_specific_country_analysis(latam_data, top_happiness_data, year, country_filter, region_filter)
+    # Si se selecciona "Ranking de Países": brechas de todos los países del año
+    elif info_filter == 'Ranking de Países':
+        st.header(f'Ranking de todos los países por brecha de factores ({year})')
+        ranking_view(year, top_n)
 
+    # Si se selecciona "Estadísticas": descripción y outliers de cada factor
+    elif info_filter == 'Estadísticas':
+        st.header(f'Estadísticas de los factores ({year})')
+        statistics_view(year, region)
 
-        # Mostrar graficos especificos para cada pais, para los de latam mostrar comparaciones de por que les ganan los del top global, y para los del top globar resaltar que los hace estar en el top
+    # Si se selecciona "Reservas de Monitorías": ocupación de las monitorías (no depende del año)
+    elif info_filter == 'Reservas de Monitorías':
+        st.header('Reservas de Monitorías')
+        bookings_view()
     
     # Si se selecciona "Información General"
     else:
         # Mostrar las gráficas generales (porcentaje de diferencia entre LATAM y Top Global)
         st.header('Análisis General por Año')
-        comparison_df = calculate_comparison(latam_data, top_happiness_data)
-        plot_comparison(comparison_df, year)
+        comparison_df = calculate_comparison(aggregates, region)
+        plot_comparison(comparison_df, year, label)
         
-        # Explicaciones específicas para los años 2015 y 2016
-        if year == 2015:
+        # Explicaciones específicas para los años 2015 y 2016 (sobre LATAM)
+        if region == LATAM_REGION and year == 2015:
             st.markdown("""
             **En 2015, lo que más contribuyó a la diferencia de felicidad entre el Top Global y LATAM fue la confianza en el gobierno.** 
             Los países con mayor felicidad en el ranking global, como Dinamarca y Suiza, tienen niveles de confianza en las instituciones gubernamentales mucho más altos en comparación con muchos países de LATAM. Esto se traduce en una mayor sensación de seguridad y bienestar, lo que impacta directamente en los niveles de felicidad general de la población.
             """)
-        elif year == 2016:
+        elif region == LATAM_REGION and year == 2016:
             st.markdown("""
             **En 2016, la generosidad fue el factor clave que diferenció el Top Global de LATAM.**
             A pesar de que LATAM tiene una fuerte red de apoyo familiar y social, los países más felices globalmente, como Dinamarca y Noruega, mostraron altos niveles de generosidad, medida por la disposición de los ciudadanos a donar tiempo o dinero. Esta generosidad está asociada con una mayor cohesión social y un sentido de comunidad, lo cual tiene un impacto directo en los niveles de felicidad de esos países.
@@ -352,8 +979,9 @@ def main():
 
 
         # Mostrar mapa de LATAM y países globales
-        st.header('Mapa de LATAM y Países Globales')
-        display_maps(year)
+        st.header(f'Mapa de {label} y Países Globales')
+        show_all = st.checkbox('Mostrar todos los países', value=False)
+        display_maps(year, show_all, region, top_n)
         
         # Explicación sobre la ubicación geográfica y su relación con la felicidad
         st.markdown("""
@@ -369,8 +997,8 @@ def main():
         """)
 
         # Llamar la función para mostrar el gráfico
-        st.header(f'Gráfico de barras comparativo entre los países de LATAM y el Top Global por Happiness Score para {year}')
-        plot_happiness_comparison(latam_data, top_happiness_data)
+        st.header(f'Gráfico de barras comparativo entre los países de {label} y el Top Global por Happiness Score para {year}')
+        plot_happiness_comparison(region_top, global_top, label)
         
         # Conclusiones
         st.write("""
@@ -391,10 +1019,10 @@ def main():
 
 
         # Llamar la función para mostrar el gráfico
-        st.header(f'Comparación de factores de felicidad entre los países LATAM y el Top Global (Heatmap de correlación) para {year}')
-        plot_factor_comparison_heatmap(latam_data, top_happiness_data)
+        st.header(f'Comparación de factores de felicidad entre los países {label} y el Top Global (Heatmap de correlación) para {year}')
+        plot_factor_comparison_heatmap(aggregates, region)
 
-        if year == 2015:
+        if region == LATAM_REGION and year == 2015:
         # Conclusiones para 2015
             st.write("""
             ### Conclusiones:
@@ -404,7 +1032,7 @@ def main():
                - Además, la **generosidad** en los países del Top Global fue significativamente mayor, lo cual podría haber influido positivamente en sus niveles de bienestar y cohesión social.
                - **Familia** y **Economía** mostraron correlaciones relativamente fuertes en ambos grupos, aunque los países de LATAM quedaron por debajo de los puntajes de los países en el Top Global.
             """)
-        else:
+        elif region == LATAM_REGION and year == 2016:
             st.write("""
             ### Conclusiones:
             
@@ -415,6 +1043,9 @@ def main():
         
             """)
 
+    if debug_enabled():
+        show_debug_panel()
+
     st.write("""
     ### Referencias:
     
@@ -430,6 +1061,7 @@ def main():
 
 # Ejecutar la aplicación
 if __name__ == "__main__":
-    main()
+    with metrics.stage('rerun'):
+        main()
 
 
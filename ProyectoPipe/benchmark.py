@@ -0,0 +1,358 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# Los gráficos se dibujan sin pantalla y la caché de imágenes no usa disco, así cada
+# repetición "en frío" mide el render completo
+os.environ.setdefault('MPLBACKEND', 'Agg')
+os.environ['FIGURE_CACHE_DIR'] = ''
+
+import app
+import ingest
+import snapshot
+import stats
+from cache import data_cache, figure_cache, map_cache
+from streamlit import config as streamlit_config
+from streamlit import logger as streamlit_logger
+
+# Fuera de `streamlit run` las llamadas a st.* avisan en cada uso que no hay sesión.
+# Se lee la configuración antes de bajar el nivel de log, porque al leerla Streamlit
+# vuelve a fijar el nivel configurado
+streamlit_config.get_option('logger.level')
+streamlit_logger.set_log_level(logging.ERROR)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Bases de datos sintéticas (se generan una vez y se reutilizan entre ejecuciones)
+DATA_DIR = os.path.join(BASE_DIR, 'benchmark_data')
+BASELINE_PATH = os.path.join(BASE_DIR, 'benchmark_baseline.json')
+
+# Tamaños por defecto: filas totales de la tabla happiness
+SIZES = [10**2, 10**4, 10**6]
+
+# Regiones del World Happiness Report (una de ellas es LATAM)
+REGIONS = [
+    'Western Europe',
+    'North America',
+    'Australia and New Zealand',
+    'Middle East and Northern Africa',
+    app.LATAM_REGION,
+    'Southeastern Asia',
+    'Central and Eastern Europe',
+    'Eastern Asia',
+    'Sub-Saharan Africa',
+    'Southern Asia',
+]
+
+# Hasta 10 años; el resto de filas se reparte en países
+MAX_YEARS = 10
+
+# Una regresión es un valor mayor que la línea base en más de la tolerancia relativa
+# y, además, en más de un mínimo absoluto (para no marcar ruido en mediciones de microsegundos)
+TOLERANCE = 0.25
+MIN_DELTA = {'cold_ms': 5.0, 'warm_ms': 2.0, 'peak_mb': 1.0}
+
+# Repeticiones mínimas para comparar con la línea base: con menos, la mediana es ruido
+MIN_REPEAT = 5
+
+# Llave de la línea base con la máquina donde se generó. Los tiempos son absolutos, así
+# que solo se comparan en una máquina equivalente; en otra hay que generar la línea base de nuevo
+MACHINE_KEY = '_machine'
+
+
+# Función para generar los datos de felicidad sintéticos, un DataFrame por año
+def synthetic_frames(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    years = min(MAX_YEARS, max(1, rows // 100))
+    countries = rows // years
+    frames = {}
+    for year in range(2015, 2015 + years):
+        factors = rng.uniform(0, 1.5, size=(countries, len(ingest.FACTOR_COLUMNS) - 2))
+        df = pd.DataFrame(factors, columns=ingest.FACTOR_COLUMNS[1:-1])
+        df.insert(0, 'Country', [f'Country {i:07d}' for i in range(countries)])
+        df.insert(1, 'Region', np.array(REGIONS)[np.arange(countries) % len(REGIONS)])
+        df['Dystopia_Residual'] = rng.uniform(0, 3, size=countries)
+        df['Happiness_Score'] = df[ingest.FACTOR_COLUMNS[1:]].sum(axis=1)
+        df['Standard_Error'] = rng.uniform(0.01, 0.1, size=countries)
+        df = df.sort_values('Happiness_Score', ascending=False, ignore_index=True)
+        df['Happiness_Rank'] = pd.array(np.arange(1, countries + 1), dtype='Int64')
+        frames[year] = df[ingest.COLUMN_NAMES]
+    return frames
+
+
+# Función para obtener la ruta de la base de datos sintética de un tamaño (la crea si no
+# existe, junto con su copia Arrow)
+def synthetic_db(rows, data_dir=DATA_DIR):
+    db_path = os.path.join(data_dir, f'happiness_{rows}.db')
+    if os.path.exists(db_path):
+        if snapshot.open_snapshot(db_path) is None:
+            snapshot.export_snapshot(db_path)
+        return db_path
+
+    os.makedirs(data_dir, exist_ok=True)
+    frames = synthetic_frames(rows)
+    countries = frames[min(frames)]['Country']
+    rng = np.random.default_rng(1)
+    centroids_csv = os.path.join(data_dir, f'centroids_{rows}.csv')
+    pd.DataFrame({
+        'Country': countries,
+        'Latitude': rng.uniform(-60, 70, size=len(countries)),
+        'Longitude': rng.uniform(-180, 180, size=len(countries)),
+    }).to_csv(centroids_csv, index=False)
+
+    print(f"Generando base de datos sintética de {rows} filas en {db_path}")
+    ingest.rebuild_database(frames, db_path, centroids_csv)
+    os.remove(centroids_csv)
+    snapshot.export_snapshot(db_path)
+    return db_path
+
+
+def clear_caches():
+    data_cache.clear()
+    figure_cache.clear()
+    map_cache.clear()
+
+
+# Casos de benchmark: cada uno prepara sus argumentos (fuera de la medición) y devuelve
+# la llamada a medir. Los datos de entrada se leen a través de la caché, que se vacía
+# antes de cada repetición en frío
+def case_load_data(db_path, year):
+    return lambda: app.load_data(year, db_path)
+
+
+def case_calculate_comparison(db_path, year):
+    aggregates = app.load_aggregates(year, db_path)
+    return lambda: app.calculate_comparison(aggregates)
+
+
+def case_factor_statistics(db_path, year):
+    countries = app.load_countries(year, db_path)
+    return lambda: stats.factor_statistics(countries)
+
+
+def case_plot_comparison(db_path, year):
+    comparison_df = app.calculate_comparison(app.load_aggregates(year, db_path))
+    return lambda: app.plot_comparison(comparison_df, year)
+
+
+def case_plot_factor_comparison_heatmap(db_path, year):
+    aggregates = app.load_aggregates(year, db_path)
+    return lambda: app.plot_factor_comparison_heatmap(aggregates)
+
+
+def case_plot_specific_country_analysis(db_path, year):
+    countries = app.load_countries(year, db_path)
+    aggregates = app.load_aggregates(year, db_path)
+    country = app.country_options(countries, 'LATAM')[0]
+    country_data = app.select_country(countries, country)
+    return lambda: app.plot_specific_country_analysis(country_data, aggregates, year, country, 'LATAM')
+
+
+def case_display_maps(db_path, year):
+    return lambda: app.display_maps(year, False, db_path=db_path)
+
+
+def case_display_maps_all(db_path, year):
+    return lambda: app.display_maps(year, True, db_path=db_path)
+
+
+# Caso de carga leyendo siempre de SQLite (sin la copia Arrow), para comparar
+def case_load_data_sqlite(db_path, year):
+    def run():
+        previous = app.USE_SNAPSHOT
+        app.USE_SNAPSHOT = False
+        try:
+            app.load_data(year, db_path)
+        finally:
+            app.USE_SNAPSHOT = previous
+    return run
+
+
+# Los casos de gráficos se miden con cada backend (app.CHART_BACKENDS)
+def with_backend(case, backend):
+    def prepare(db_path, year):
+        call = case(db_path, year)
+        def run():
+            previous = app.CHART_BACKEND
+            app.CHART_BACKEND = backend
+            try:
+                call()
+            finally:
+                app.CHART_BACKEND = previous
+        return run
+    return prepare
+
+
+CHART_CASES = {
+    'plot_comparison': case_plot_comparison,
+    'plot_factor_comparison_heatmap': case_plot_factor_comparison_heatmap,
+    'plot_specific_country_analysis': case_plot_specific_country_analysis,
+}
+
+CASES = {
+    'load_data': case_load_data,
+    'load_data[sqlite]': case_load_data_sqlite,
+    'calculate_comparison': case_calculate_comparison,
+    'factor_statistics': case_factor_statistics,
+    **{f'{name}[{backend}]': with_backend(case, backend) for name, case in CHART_CASES.items() for backend in app.CHART_BACKENDS},
+    'display_maps': case_display_maps,
+    'display_maps[todos]': case_display_maps_all,
+}
+
+
+def elapsed_ms(call):
+    start = time.perf_counter()
+    call()
+    return (time.perf_counter() - start) * 1000
+
+
+# Función para medir un caso: mediana en frío (cachés vacías), mediana en caliente
+# (segunda llamada, servida desde caché) y pico de memoria de Python en frío (tracemalloc;
+# no incluye la memoria que reserva SQLite por fuera del intérprete)
+def measure(case, db_path, year, repeat):
+    cold, warm = [], []
+    for _ in range(repeat):
+        clear_caches()
+        call = case(db_path, year)
+        cold.append(elapsed_ms(call))
+        warm.append(elapsed_ms(call))
+
+    clear_caches()
+    call = case(db_path, year)
+    tracemalloc.start()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'cold_ms': round(statistics.median(cold), 3),
+        'warm_ms': round(statistics.median(warm), 3),
+        'peak_mb': round(peak / 1024 / 1024, 3),
+    }
+
+
+def run_benchmarks(sizes=SIZES, cases=None, repeat=3, data_dir=DATA_DIR):
+    results = {}
+    for rows in sizes:
+        db_path = synthetic_db(rows, data_dir)
+        year = app.available_years(db_path)[0]
+        for name in cases or CASES:
+            results[f'{name}@{rows}'] = measure(CASES[name], db_path, year, repeat)
+            print(f"  {name} ({rows} filas): {results[f'{name}@{rows}']['cold_ms']:.1f} ms")
+    return results
+
+
+# Función para comparar los resultados con la línea base guardada
+def find_regressions(results, baseline, tolerance=TOLERANCE):
+    regressions = []
+    for key, values in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        for metric, value in values.items():
+            limit = reference[metric] * (1 + tolerance)
+            if value > limit and value - reference[metric] > MIN_DELTA[metric]:
+                regressions.append((key, metric, reference[metric], value))
+    return regressions
+
+
+# Función para volver a medir (con el doble de repeticiones) los casos marcados como
+# regresión. Solo se mantienen los que siguen por encima del límite: una repetición
+# lenta por ruido de la máquina no hace fallar la comparación
+def confirm_regressions(regressions, baseline, repeat, data_dir=DATA_DIR, tolerance=TOLERANCE):
+    confirmed = []
+    for key in dict.fromkeys(key for key, *_ in regressions):
+        name, rows = key.rsplit('@', 1)
+        print(f"Volviendo a medir {key}")
+        results = run_benchmarks([int(rows)], [name], 2 * repeat, data_dir)
+        confirmed += find_regressions(results, baseline, tolerance)
+    return confirmed
+
+
+# Datos de la máquina que se guardan con la línea base: arquitectura, CPUs y versiones de
+# Python, NumPy y pandas (no el nombre del equipo, que cambia entre contenedores y CI)
+def machine_info():
+    return {
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+
+
+# Función para decidir si los resultados se pueden comparar con la línea base. Devuelve
+# el motivo por el que no (o None si sí se pueden comparar)
+def baseline_mismatch(baseline, repeat):
+    if repeat < MIN_REPEAT:
+        return f"se necesitan al menos {MIN_REPEAT} repeticiones (--repeat) para comparar con la línea base"
+    if baseline.get(MACHINE_KEY) != machine_info():
+        return "la línea base se generó en otra máquina o con otras versiones; genere una nueva con --save-baseline"
+    return None
+
+
+def results_table(results, baseline):
+    table = pd.DataFrame.from_dict(results, orient='index')
+    table.index.name = 'caso'
+    for metric in ['cold_ms', 'peak_mb']:
+        table[f'{metric} base'] = [baseline.get(key, {}).get(metric, np.nan) for key in table.index]
+    return table.round(2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mide latencia y memoria de las funciones del dashboard sobre bases de datos sintéticas.')
+    parser.add_argument('--sizes', type=int, nargs='*', default=SIZES, help='Filas totales de cada base de datos sintética')
+    parser.add_argument('--cases', nargs='*', choices=list(CASES), help='Casos a medir (por defecto, todos)')
+    parser.add_argument('--repeat', type=int, default=MIN_REPEAT, help='Repeticiones por caso (se reporta la mediana)')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='Carpeta de las bases de datos sintéticas')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Archivo JSON con la línea base')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='Aumento relativo permitido antes de marcar una regresión')
+    parser.add_argument('--save-baseline', action='store_true', help='Guardar los resultados como nueva línea base')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.cases, args.repeat, args.data_dir)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print(results_table(results, baseline).to_string())
+
+    if args.save_baseline:
+        if args.repeat < MIN_REPEAT:
+            parser.error(f"la línea base necesita al menos {MIN_REPEAT} repeticiones")
+        if baseline.get(MACHINE_KEY) != machine_info():
+            # Los tiempos de otra máquina no se mezclan con los de esta
+            baseline = {}
+        baseline.update(results)
+        baseline[MACHINE_KEY] = machine_info()
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Línea base guardada en {args.baseline}")
+        return
+
+    mismatch = baseline_mismatch(baseline, args.repeat)
+    if mismatch:
+        print(f"No se comparan regresiones: {mismatch}")
+        return
+
+    regressions = find_regressions(results, baseline, args.tolerance)
+    if regressions:
+        regressions = confirm_regressions(regressions, baseline, args.repeat, args.data_dir, args.tolerance)
+    for key, metric, reference, value in regressions:
+        print(f"REGRESIÓN {key} {metric}: {reference:.2f} -> {value:.2f}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
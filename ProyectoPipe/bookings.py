@@ -0,0 +1,293 @@
+import argparse
+import glob
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Exportaciones de Microsoft Bookings (TSV) y base de datos donde se cargan, junto a happiness_data.db.
+# Es un archivo aparte para que cargar reservas no cambie la versión de los datos de felicidad
+BOOKINGS_PATTERN = os.path.join(BASE_DIR, 'BookingsReportingData*.tsv')
+BOOKINGS_DB_PATH = os.path.join(BASE_DIR, 'bookings_data.db')
+
+BOOKINGS_TABLE = 'bookings'
+
+# Filas que se leen del TSV por bloque. La memoria usada depende de este valor y no del
+# tamaño del archivo, así que una exportación de varios GB se carga igual que una pequeña
+CHUNK_ROWS = 50_000
+
+# Columnas del TSV que se cargan -> nombre en la base de datos. Las demás (dirección,
+# moneda, campos personalizados, datos de seguimiento...) vienen vacías en las exportaciones
+SOURCE_COLUMNS = {
+    'Date Time': 'Start_Time',
+    'Customer Name': 'Customer_Name',
+    'Customer Email': 'Customer_Email',
+    'Customer Phone': 'Customer_Phone',
+    'Staff Name': 'Staff',
+    'Service': 'Service',
+    'Location': 'Location',
+    'Duration (mins.)': 'Duration_Min',
+    'Price': 'Price',
+    'Signed Up Attendees Count': 'Attendees',
+    'Event Type': 'Event_Type',
+    'Booking Id': 'Booking_Id',
+}
+
+# Columnas con pocos valores distintos: cada valor se guarda una vez en su propia tabla
+# y la tabla de reservas guarda solo el código entero (como un Categorical de pandas)
+DIMENSIONS = {
+    'Staff': 'booking_staff',
+    'Service': 'booking_services',
+    'Location': 'booking_locations',
+}
+
+# Esquema de la tabla de reservas. En las sesiones grupales el mismo Booking Id se repite
+# una vez por asistente, así que cada fila se identifica por (Booking_Id, Customer_Email).
+# Start_Time son segundos desde 1970 de la hora local de la exportación
+BOOKING_COLUMNS = [
+    ('Booking_Id', 'TEXT NOT NULL'),
+    ('Customer_Email', 'TEXT NOT NULL'),
+    ('Start_Time', 'INTEGER NOT NULL'),
+    ('Customer_Name', 'TEXT'),
+    ('Customer_Phone', 'TEXT'),
+    ('Staff_Id', 'INTEGER'),
+    ('Service_Id', 'INTEGER'),
+    ('Location_Id', 'INTEGER'),
+    ('Duration_Min', 'INTEGER'),
+    ('Price', 'REAL'),
+    ('Attendees', 'INTEGER'),
+    ('Event_Type', 'TEXT'),
+]
+BOOKING_KEY = ['Booking_Id', 'Customer_Email']
+BOOKING_NAMES = [name for name, _ in BOOKING_COLUMNS]
+
+# Totales de reservas y minutos reservados por monitor, servicio, lugar y hora de la
+# semana. Los mantienen triggers de SQLite en cada inserción, actualización o borrado de
+# una reserva, así leerlos no depende de cuántas reservas haya en la historia.
+# Member es el código de la dimensión (0 = sin valor) o, para 'Hour', día * 24 + hora
+# con el lunes como día 0
+ROLLUPS_TABLE = 'booking_rollups'
+ROLLUP_DIMENSIONS = [*DIMENSIONS, 'Hour']
+WEEKDAYS = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+
+# Función para convertir las fechas de la exportación en español ("6/08/2024 9:30 a. m.",
+# con un espacio no separable entre "a." y "m.") a datetime, de forma vectorizada sobre
+# todo el bloque. Las fechas que no tienen ese formato quedan como NaT
+def parse_datetimes(values):
+    values = values.str.replace('\xa0', ' ', regex=False).str.strip()
+    values = values.str.replace(r'\s*a\.\s*m\.$', ' AM', regex=True).str.replace(r'\s*p\.\s*m\.$', ' PM', regex=True)
+    return pd.to_datetime(values, format='%d/%m/%Y %I:%M %p', errors='coerce')
+
+
+# Función para llevar un bloque del TSV a las columnas y tipos de la base de datos.
+# Devuelve el bloque sin filas repetidas y la cantidad de filas descartadas por no tener
+# fecha, Booking Id o correo válidos
+def normalize_chunk(chunk):
+    chunk = chunk.rename(columns=lambda col: SOURCE_COLUMNS[col.strip()])
+    start = parse_datetimes(chunk['Start_Time'])
+    valid = start.notna() & chunk['Booking_Id'].notna() & chunk['Customer_Email'].notna()
+
+    df = pd.DataFrame({
+        'Booking_Id': chunk['Booking_Id'].str.strip(),
+        'Customer_Email': chunk['Customer_Email'].str.strip().str.lower(),
+        'Start_Time': start.astype('datetime64[s]').astype('int64'),
+        'Customer_Name': chunk['Customer_Name'].str.strip(),
+        'Customer_Phone': chunk['Customer_Phone'].str.strip(),
+        'Staff': chunk['Staff'].str.strip(),
+        'Service': chunk['Service'].str.strip(),
+        'Location': chunk['Location'].str.strip(),
+        'Duration_Min': pd.to_numeric(chunk['Duration_Min'], errors='coerce').astype('Int64'),
+        'Price': pd.to_numeric(chunk['Price'], errors='coerce'),
+        'Attendees': pd.to_numeric(chunk['Attendees'], errors='coerce').astype('Int64'),
+        'Event_Type': chunk['Event_Type'].str.strip(),
+    })[valid.to_numpy()]
+    return df.drop_duplicates(BOOKING_KEY, keep='last'), int((~valid).sum())
+
+
+# Expresión SQL de la hora de la semana de una reserva (el 1 de enero de 1970 fue jueves)
+def hour_of_week_sql(row):
+    return f'(({row}.Start_Time / 86400 + 3) % 7) * 24 + ({row}.Start_Time % 86400) / 3600'
+
+
+# Sentencia que suma (sign=1) o resta (sign=-1) una reserva (NEW u OLD) en los totales
+def rollup_upsert_sql(row, sign):
+    members = [f'coalesce({row}.{column}_Id, 0)' for column in DIMENSIONS] + [hour_of_week_sql(row)]
+    values = ',\n        '.join(f"('{dimension}', {member}, {sign}, {sign} * coalesce({row}.Duration_Min, 0))"
+                                   for dimension, member in zip(ROLLUP_DIMENSIONS, members))
+    return f'''INSERT INTO {ROLLUPS_TABLE} (Dimension, Member, Bookings, Minutes) VALUES
+        {values}
+    ON CONFLICT (Dimension, Member) DO UPDATE SET Bookings = Bookings + excluded.Bookings, Minutes = Minutes + excluded.Minutes;'''
+
+
+def create_tables(conn):
+    for table in DIMENSIONS.values():
+        conn.execute(f'''CREATE TABLE IF NOT EXISTS {table} (
+    Id INTEGER PRIMARY KEY,
+    Name TEXT NOT NULL UNIQUE
+) STRICT''')
+    columns_sql = ',\n    '.join(f'{name} {sql_type}' for name, sql_type in BOOKING_COLUMNS)
+    conn.execute(f'''CREATE TABLE IF NOT EXISTS {BOOKINGS_TABLE} (
+    {columns_sql},
+    PRIMARY KEY ({', '.join(BOOKING_KEY)})
+) STRICT, WITHOUT ROWID''')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{BOOKINGS_TABLE}_start ON {BOOKINGS_TABLE} (Start_Time)')
+    create_rollups(conn)
+
+
+# Función para crear la tabla de totales y sus triggers. Si la tabla no existía (una base
+# de datos cargada antes de los totales) se calcula una vez a partir de las reservas
+def create_rollups(conn):
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (ROLLUPS_TABLE,)).fetchone()
+    conn.execute(f'''CREATE TABLE IF NOT EXISTS {ROLLUPS_TABLE} (
+    Dimension TEXT NOT NULL,
+    Member INTEGER NOT NULL,
+    Bookings INTEGER NOT NULL,
+    Minutes INTEGER NOT NULL,
+    PRIMARY KEY (Dimension, Member)
+) STRICT, WITHOUT ROWID''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {ROLLUPS_TABLE}_insert AFTER INSERT ON {BOOKINGS_TABLE} BEGIN
+    {rollup_upsert_sql('NEW', 1)}
+END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {ROLLUPS_TABLE}_update AFTER UPDATE ON {BOOKINGS_TABLE} BEGIN
+    {rollup_upsert_sql('OLD', -1)}
+    {rollup_upsert_sql('NEW', 1)}
+END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {ROLLUPS_TABLE}_delete AFTER DELETE ON {BOOKINGS_TABLE} BEGIN
+    {rollup_upsert_sql('OLD', -1)}
+END''')
+    if not exists:
+        rebuild_rollups(conn)
+
+
+# Función para recalcular los totales desde cero a partir de todas las reservas
+def rebuild_rollups(conn):
+    members = [f'coalesce({column}_Id, 0)' for column in DIMENSIONS] + [hour_of_week_sql(BOOKINGS_TABLE)]
+    conn.execute(f'DELETE FROM {ROLLUPS_TABLE}')
+    for dimension, member in zip(ROLLUP_DIMENSIONS, members):
+        conn.execute(f"INSERT INTO {ROLLUPS_TABLE} SELECT '{dimension}', {member}, COUNT(*), SUM(coalesce(Duration_Min, 0)) "
+                     f"FROM {BOOKINGS_TABLE} GROUP BY 2")
+
+
+# Función para leer los códigos ya asignados de una dimensión (nombre -> código)
+def read_codes(conn, table):
+    return dict(conn.execute(f'SELECT Name, Id FROM {table}'))
+
+
+# Función para convertir los valores de una columna en códigos de su dimensión. Los valores
+# nuevos se agregan a la tabla; codes guarda el diccionario de la dimensión entre bloques
+def encode(conn, table, values, codes):
+    new = [name for name in values.dropna().unique() if name not in codes]
+    if new:
+        conn.executemany(f'INSERT OR IGNORE INTO {table} (Name) VALUES (?)', ((name,) for name in new))
+        codes.update(read_codes(conn, table))
+    return values.map(codes).astype('Int64')
+
+
+# Función para guardar un bloque. Si una reserva (Booking_Id, Customer_Email) ya estaba,
+# por ejemplo porque dos exportaciones se solapan, se reemplaza por la versión más reciente
+def write_chunk(conn, df, codes):
+    df = df.assign(**{f'{column}_Id': encode(conn, table, df[column], codes[table]) for column, table in DIMENSIONS.items()})
+    rows = df[BOOKING_NAMES].astype(object).where(df[BOOKING_NAMES].notna(), None)
+    placeholders = ', '.join('?' for _ in BOOKING_NAMES)
+    updates = ', '.join(f'{name} = excluded.{name}' for name in BOOKING_NAMES if name not in BOOKING_KEY)
+    conn.executemany(f'INSERT INTO {BOOKINGS_TABLE} ({", ".join(BOOKING_NAMES)}) VALUES ({placeholders}) '
+                     f'ON CONFLICT ({", ".join(BOOKING_KEY)}) DO UPDATE SET {updates}',
+                     rows.itertuples(index=False, name=None))
+
+
+# Función para leer un TSV por bloques (solo las columnas que se cargan, todas como texto)
+def read_chunks(path, chunk_rows=CHUNK_ROWS):
+    return pd.read_csv(path, sep='\t', dtype=str, encoding='utf-8-sig', chunksize=chunk_rows,
+                       usecols=lambda col: col.strip() in SOURCE_COLUMNS, keep_default_na=False, na_values=[''])
+
+
+# Función para cargar una o varias exportaciones en la base de datos. Cada bloque se
+# guarda en su propia transacción, así la memoria no crece con el tamaño del archivo
+def load_bookings(paths, db_path=BOOKINGS_DB_PATH, chunk_rows=CHUNK_ROWS):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        create_tables(conn)
+    codes = {table: read_codes(conn, table) for table in DIMENSIONS.values()}
+
+    for path in paths:
+        rows = written = invalid = 0
+        for chunk in read_chunks(path, chunk_rows):
+            df, discarded = normalize_chunk(chunk)
+            with conn:
+                write_chunk(conn, df, codes)
+            rows += len(chunk)
+            written += len(df)
+            invalid += discarded
+        print(f"{os.path.basename(path)}: {rows} filas leídas, {written} reservas guardadas, "
+              f"{rows - written - invalid} repetidas, {invalid} descartadas")
+    total = conn.execute(f'SELECT COUNT(*) FROM {BOOKINGS_TABLE}').fetchone()[0]
+    conn.close()
+    print(f"{BOOKINGS_TABLE}: {total} reservas en {db_path}")
+
+
+# Función para leer las reservas como DataFrame: Start_Time como datetime y las columnas
+# de las dimensiones como Categorical (códigos enteros más una lista de nombres)
+def read_bookings(db_path=BOOKINGS_DB_PATH, where='', params=()):
+    conn = sqlite3.connect(db_path)
+    df = pd.read_sql_query(f'SELECT * FROM {BOOKINGS_TABLE} {where}', conn, params=params)
+    for column, table in DIMENSIONS.items():
+        names = pd.read_sql_query(f'SELECT Id, Name FROM {table} ORDER BY Id', conn)
+        positions = pd.Index(names['Id']).get_indexer(df.pop(f'{column}_Id').fillna(-1).astype('int64'))
+        df[column] = pd.Categorical.from_codes(positions, categories=names['Name'])
+    conn.close()
+    df['Start_Time'] = pd.to_datetime(df['Start_Time'], unit='s')
+    return df
+
+
+# Función para leer los totales con el nombre de cada valor: un DataFrame por dimensión
+# con Name, Bookings y Hours (las horas reservadas). Para 'Hour' las columnas son Weekday
+# (nombre del día), Day (0 = lunes), Hour y las mismas medidas
+def read_rollups(db_path=BOOKINGS_DB_PATH):
+    conn = sqlite3.connect(db_path)
+    rollups = pd.read_sql_query(f'SELECT * FROM {ROLLUPS_TABLE} WHERE Bookings > 0', conn)
+    names = {column: dict(conn.execute(f'SELECT Id, Name FROM {table}')) for column, table in DIMENSIONS.items()}
+    conn.close()
+
+    rollups['Hours'] = rollups['Minutes'] / 60
+    result = {}
+    for dimension, df in rollups.groupby('Dimension'):
+        df = df.drop(columns=['Dimension', 'Minutes'])
+        if dimension == 'Hour':
+            df = df.assign(Day=df['Member'] // 24, Hour=df['Member'] % 24)
+            df['Weekday'] = np.array(WEEKDAYS)[df['Day']]
+            result[dimension] = df.drop(columns='Member').sort_values(['Day', 'Hour'], ignore_index=True)
+        else:
+            df = df.assign(Name=df['Member'].map(names[dimension]).fillna('Sin dato'))
+            result[dimension] = df.drop(columns='Member').sort_values('Bookings', ascending=False, ignore_index=True)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Carga exportaciones de Microsoft Bookings (TSV) en SQLite por bloques.')
+    parser.add_argument('tsv', nargs='*', help='Archivos TSV (por defecto, BookingsReportingData*.tsv junto al script)')
+    parser.add_argument('--db', default=BOOKINGS_DB_PATH, help='Ruta de la base de datos SQLite de reservas')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_ROWS, help='Filas por bloque')
+    parser.add_argument('--rebuild-rollups', action='store_true', help='Recalcular los totales a partir de todas las reservas')
+    args = parser.parse_args()
+
+    if args.rebuild_rollups:
+        conn = sqlite3.connect(args.db)
+        with conn:
+            create_tables(conn)
+            rebuild_rollups(conn)
+        conn.close()
+        if not args.tsv:
+            return
+
+    paths = args.tsv or sorted(glob.glob(BOOKINGS_PATTERN))
+    if not paths:
+        parser.error('No se encontraron exportaciones para cargar.')
+    load_bookings(paths, args.db, args.chunk_size)
+
+
+if __name__ == '__main__':
+    main()
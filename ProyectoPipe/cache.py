@@ -0,0 +1,170 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+# Marca de llave ausente: distingue un fallo de la caché de un valor None guardado
+_MISSING = object()
+
+
+# Caché LRU compartida por todo el proceso (todas las sesiones de Streamlit usan
+# la misma instancia, por eso las operaciones van protegidas con un lock).
+# Con max_bytes el límite se mide en bytes usando len() de cada valor guardado
+class LRUCache:
+    def __init__(self, max_entries=32, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._loading = {}
+        self.hits = 0
+        self.misses = 0
+
+    # Devuelve el valor guardado o default si no está; marca la entrada como usada
+    # recientemente. None también se puede guardar como valor
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    # Devuelve (valor, creado). Si la llave no está, el valor se crea con create() una sola
+    # vez: las sesiones que piden la misma llave al mismo tiempo esperan a la primera y
+    # reciben el mismo objeto, en lugar de cargar cada una su propia copia
+    def get_or_create(self, key, create):
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value, False
+
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                with self._lock:
+                    value = self._data.get(key, _MISSING)
+                created = value is _MISSING
+                if created:
+                    value = create()
+                    self.put(key, value)
+        finally:
+            # Si create() falla la llave no debe quedar marcada como en carga
+            with self._lock:
+                self._loading.pop(key, None)
+        return value, created
+
+    # Guarda un valor y expulsa las entradas menos usadas si se supera el límite
+    def put(self, key, value):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = value
+            self._sizes[key] = len(value) if self.max_bytes is not None else 0
+            self._bytes += self._sizes[key]
+            while len(self._data) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes and len(self._data) > 1):
+                self._remove(next(iter(self._data)))
+
+    def _remove(self, key):
+        del self._data[key]
+        self._bytes -= self._sizes.pop(key)
+
+    # Elimina las entradas cuya llave cumple la condición dada
+    def invalidate(self, predicate):
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    # Contadores de aciertos y fallos para depuración
+    def stats(self):
+        with self._lock:
+            stats = {'hits': self.hits, 'misses': self.misses, 'entries': len(self._data), 'max_entries': self.max_entries}
+            if self.max_bytes is not None:
+                stats.update({'bytes': self._bytes, 'max_bytes': self.max_bytes})
+            return stats
+
+
+# Caché de imágenes ya renderizadas (bytes PNG/SVG). La memoria es una LRU limitada en
+# bytes; si se indica disk_dir, cada imagen también se guarda en disco y se recupera de
+# ahí cuando ya salió de memoria (por ejemplo después de reiniciar el servidor)
+class FigureCache(LRUCache):
+    def __init__(self, max_bytes, disk_dir=None, max_entries=10_000):
+        super().__init__(max_entries=max_entries, max_bytes=max_bytes)
+        self.disk_dir = disk_dir
+        self.disk_hits = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key)
+
+    def get(self, key, default=None):
+        value = super().get(key, _MISSING)
+        if value is _MISSING and self.disk_dir and os.path.exists(self._disk_path(key)):
+            with open(self._disk_path(key), 'rb') as f:
+                value = f.read()
+            with self._lock:
+                self.disk_hits += 1
+            super().put(key, value)
+        return default if value is _MISSING else value
+
+    def put(self, key, value):
+        super().put(key, value)
+        if self.disk_dir:
+            # Se escribe en un archivo temporal y se renombra para no dejar imágenes a medias
+            tmp_path = f'{self._disk_path(key)}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(value)
+            os.replace(tmp_path, self._disk_path(key))
+
+    def stats(self):
+        stats = super().stats()
+        stats['disk_hits'] = self.disk_hits
+        return stats
+
+
+# Función para obtener una huella estable de los datos de entrada de un gráfico
+def hash_inputs(*args):
+    digest = hashlib.blake2b(digest_size=16)
+    for arg in args:
+        if isinstance(arg, (pd.DataFrame, pd.Series)):
+            digest.update(repr(arg.shape).encode())
+            digest.update(repr(list(arg.columns) if isinstance(arg, pd.DataFrame) else arg.name).encode())
+            digest.update(pd.util.hash_pandas_object(arg, index=True).values.tobytes())
+        elif isinstance(arg, np.ndarray):
+            digest.update(repr((arg.shape, arg.dtype.str)).encode())
+            digest.update(np.ascontiguousarray(arg).tobytes())
+        else:
+            digest.update(repr(arg).encode())
+        digest.update(b'|')
+    return digest.hexdigest()
+
+
+# Instancias compartidas. Viven en este módulo y no en app.py porque Streamlit vuelve
+# a ejecutar app.py en cada rerun, mientras que los módulos importados se cargan una vez
+data_cache = LRUCache(max_entries=32)
+
+# HTML de los mapas ya generados por (año, selección)
+map_cache = LRUCache(max_entries=16)
+
+# Límite de memoria (FIGURE_CACHE_MB) y carpeta opcional en disco (FIGURE_CACHE_DIR)
+figure_cache = FigureCache(
+    max_bytes=int(float(os.environ.get('FIGURE_CACHE_MB', '64')) * 1024 * 1024),
+    disk_dir=os.environ.get('FIGURE_CACHE_DIR') or None,
+)
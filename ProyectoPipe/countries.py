@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+
+from ingest import FACTOR_COLUMNS
+
+
+# Tabla de los países de un año con un índice país -> fila. Los factores se guardan
+# como una matriz (países x factores), así las brechas de todos los países contra un
+# grupo de referencia se calculan en una sola operación en lugar de un país por rerun.
+# Las filas se ordenan una sola vez por Happiness_Score (de mayor a menor), así la
+# posición de cada fila es su ranking global y el top N de cualquier región es un
+# corte de las filas de esa región, sin volver a ordenar en cada rerun.
+# Una sola instancia por año se comparte entre todas las sesiones (desde la caché del
+# proceso): los arreglos son de solo lectura y top() y country() devuelven cortes
+# contiguos, que con Copy-on-Write de pandas son vistas sin copiar datos. Si las filas ya
+# llegan ordenadas (la copia Arrow de snapshot.py) no se reordenan ni se copian
+class CountryTable:
+    def __init__(self, df, factors=FACTOR_COLUMNS):
+        if not df['Happiness_Score'].is_monotonic_decreasing:
+            df = df.sort_values('Happiness_Score', ascending=False, kind='stable')
+        self.frame = df.reset_index(drop=True)
+        self.factors = list(factors)
+        self.countries = self.frame['Country'].to_numpy()
+        self.regions = self.frame['Region'].to_numpy()
+        self.scores = self.frame['Happiness_Score'].to_numpy(dtype=float)
+        self.values = self.frame[self.factors].to_numpy(dtype=float, na_value=np.nan)
+        self.positions = dict(zip(self.countries, range(len(self.countries))))
+
+        # Filas de cada región (ordenadas por puntaje), ranking de cada país dentro de su
+        # región y puntajes en orden ascendente para buscar percentiles con searchsorted
+        self.all_rows = np.arange(len(self.frame))
+        self.region_rows = {}
+        self.region_ranks = np.zeros(len(self.frame), dtype=int)
+        self._ascending = {None: self.scores[::-1]}
+        codes, uniques = pd.factorize(self.regions)
+        for code, region in enumerate(uniques):
+            rows = np.flatnonzero(codes == code)
+            self.region_rows[region] = rows
+            self.region_ranks[rows] = np.arange(1, len(rows) + 1)
+            self._ascending[region] = self.scores[rows][::-1]
+
+        # Las mismas filas agrupadas por región (y ordenadas por puntaje dentro de cada una),
+        # así el top de una región también es un corte contiguo. El índice sigue siendo la
+        # fila en la tabla ordenada por puntaje
+        self.by_region = self.frame.iloc[np.concatenate([self.all_rows[:0], *self.region_rows.values()])]
+        self.region_slices = {}
+        start = 0
+        for region, rows in self.region_rows.items():
+            self.region_slices[region] = (start, start + len(rows))
+            start += len(rows)
+
+        for array in [self.scores, self.values, self.all_rows, self.region_ranks, *self.region_rows.values(), *self._ascending.values()]:
+            array.flags.writeable = False
+
+    def __len__(self):
+        return len(self.frame)
+
+    def __contains__(self, country):
+        return country in self.positions
+
+    # Fila (posición) de un país en la tabla
+    def row(self, country):
+        return self.positions[country]
+
+    # Datos de un país como DataFrame de una fila (igual que el filtro con máscara)
+    def country(self, country):
+        row = self.row(country)
+        return self.frame.iloc[row:row + 1]
+
+    def region_of(self, country):
+        return self.regions[self.row(country)]
+
+    # Filas de los N países con mayor puntaje de una región (o de todos si region es None)
+    def top_rows(self, n=None, region=None):
+        rows = self.all_rows if region is None else self.region_rows.get(region, self.all_rows[:0])
+        return rows if n is None else rows[:n]
+
+    # Los N países con mayor puntaje, ordenados de mayor a menor. El índice del DataFrame
+    # es la fila en la tabla, así que índice + 1 es el ranking global de cada país
+    def top(self, n=None, region=None):
+        if region is None:
+            return self.frame.iloc[:n]
+        start, stop = self.region_slices.get(region, (0, 0))
+        if n is not None:
+            stop = min(stop, start + n)
+        return self.by_region.iloc[start:stop]
+
+    # Media de cada factor entre los N países con mayor puntaje
+    def top_mean(self, n, region=None):
+        return self.top(n, region)[self.factors].mean()
+
+    # Ranking de un país (1 = más feliz), global o dentro de su región
+    def rank(self, country, region=None):
+        row = self.row(country)
+        if region is None:
+            return row + 1
+        if self.regions[row] != region:
+            raise KeyError(f"{country} no pertenece a la región {region}")
+        return int(self.region_ranks[row])
+
+    # Percentil de un país: porcentaje de países (globales o de una región) con un
+    # Happiness_Score menor o igual al suyo
+    def percentile(self, country, region=None):
+        ascending = self._ascending[region]
+        position = np.searchsorted(ascending, self.scores[self.row(country)], side='right')
+        return position / len(ascending) * 100
+
+    # Brechas de cada país contra un vector de referencia (un valor por factor):
+    # referencia - valor del país, positiva cuando el país está por debajo de la referencia
+    def gaps(self, reference):
+        reference = np.asarray(reference, dtype=float)
+        return pd.DataFrame(reference - self.values, index=self.countries, columns=self.factors)
+
+
+# Función para obtener el vector de referencia de un grupo a partir de los agregados
+# precalculados (factor x región, incluido el grupo del Top Global)
+def reference_vector(aggregates, group, factors=FACTOR_COLUMNS):
+    return aggregates.loc[factors, group].to_numpy(dtype=float)
+
+
+# Función para armar la tabla de brechas de todos los países contra un grupo de referencia
+def gap_ranking(table, aggregates, group):
+    gaps = table.gaps(reference_vector(aggregates, group, table.factors))
+    ranking = table.frame[['Country', 'Region', 'Happiness_Rank', 'Happiness_Score']].set_index('Country')
+    return ranking.join(gaps.add_prefix('Brecha_'))
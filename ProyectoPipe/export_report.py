@@ -0,0 +1,140 @@
+import argparse
+import html
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# El reporte se genera sin pantalla ni servidor de Streamlit
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import app
+
+# Carpeta por defecto del reporte estático
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reporte')
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; max-width: 1100px; margin: 2em auto; }}
+img {{ max-width: 100%; }}
+iframe {{ width: 100%; height: 500px; border: 0; }}
+</style>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+# Función para convertir el nombre de un país en un nombre de archivo
+def slugify(text):
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')
+
+
+def write_page(path, title, body):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(PAGE_TEMPLATE.format(title=html.escape(title), body=body))
+
+
+def write_image(path, render, *args):
+    with open(path, 'wb') as f:
+        f.write(app.figure_bytes(render, *args))
+
+
+# Función para cargar los datos de un año (desde la caché del proceso)
+def year_data(year, db_path):
+    return app.load_countries(year, db_path), app.load_aggregates(year, db_path)
+
+
+# Página general de un año: comparación porcentual, mapa, barras y heatmap
+def export_general(year, output_dir, db_path):
+    countries, aggregates = year_data(year, db_path)
+    year_dir = os.path.join(output_dir, str(year))
+
+    write_image(os.path.join(year_dir, 'comparacion.png'), app.render_comparison, app.calculate_comparison(aggregates), year)
+    write_image(os.path.join(year_dir, 'happiness_score.png'), app.render_happiness_comparison,
+                app.happiness_comparison_data(countries.top(app.TOP_N, app.LATAM_REGION), countries.top(app.TOP_N)))
+    write_image(os.path.join(year_dir, 'heatmap.png'), app.render_factor_heatmap, app.factor_heatmap_data(aggregates).fillna(0))
+    with open(os.path.join(year_dir, 'mapa.html'), 'w', encoding='utf-8') as f:
+        f.write(app.render_map_html(year, False, db_path=db_path))
+
+    body = f"""<p><a href="../index.html">Inicio</a></p>
+<h1>Análisis General {year}</h1>
+<h2>Diferencia porcentual de factores: LATAM vs Top Global</h2>
+<img src="comparacion.png">
+<h2>Mapa de LATAM y Países Globales</h2>
+<iframe src="mapa.html"></iframe>
+<h2>Happiness Score de LATAM y el Top Global</h2>
+<img src="happiness_score.png">
+<h2>Comparación de factores (heatmap)</h2>
+<img src="heatmap.png">
+"""
+    path = os.path.join(year_dir, 'general.html')
+    write_page(path, f'Análisis General {year}', body)
+    return os.path.relpath(path, output_dir)
+
+
+# Página específica de un país (misma vista que "Información Específica" en app.py)
+def export_country(year, region_filter, country, output_dir, db_path):
+    countries, aggregates = year_data(year, db_path)
+    slug = slugify(country)
+    country_dir = os.path.join(output_dir, str(year), 'paises')
+
+    country_data = app.select_country(countries, country)
+    render, args = app.country_figure(country_data, aggregates, year, country, region_filter)
+    write_image(os.path.join(country_dir, f'{slug}.png'), render, *args)
+
+    body = f"""<p><a href="../../index.html">Inicio</a> · <a href="../general.html">General {year}</a></p>
+<h1>{html.escape(country)} ({year}) - {region_filter}</h1>
+{country_data.to_html(index=False)}
+<img src="{slug}.png">
+"""
+    path = os.path.join(country_dir, f'{slug}.html')
+    write_page(path, f'{country} ({year})', body)
+    return os.path.relpath(path, output_dir)
+
+
+# Función para exportar el reporte completo. Las páginas de cada (año, país) son
+# independientes entre sí, así que se reparten en un pool de procesos
+def export_report(output_dir=OUTPUT_DIR, db_path=app.DB_PATH, workers=None, years=None):
+    years = years or app.available_years(db_path)
+    jobs = []
+    for year in years:
+        os.makedirs(os.path.join(output_dir, str(year), 'paises'), exist_ok=True)
+        countries, _ = year_data(year, db_path)
+        jobs.append((export_general, (year, output_dir, db_path)))
+        for region_filter in ['LATAM', app.GLOBAL_FILTER]:
+            for country in app.country_options(countries, region_filter):
+                jobs.append((export_country, (year, region_filter, country, output_dir, db_path)))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(function, *args) for function, args in jobs]
+        pages = [future.result() for future in futures]
+
+    # Índice con enlaces a todas las páginas generadas
+    links = '\n'.join(f'<li><a href="{html.escape(page)}">{html.escape(page)}</a></li>' for page in pages)
+    write_page(os.path.join(output_dir, 'index.html'), 'Análisis de Felicidad en LATAM y el Mundo',
+               f'<h1>Análisis de Felicidad en LATAM y el Mundo</h1>\n<ul>\n{links}\n</ul>')
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exporta todas las vistas del dashboard a un reporte estático HTML/PNG.')
+    parser.add_argument('--output', default=OUTPUT_DIR, help='Carpeta de salida del reporte')
+    parser.add_argument('--db', default=app.DB_PATH, help='Ruta de la base de datos SQLite')
+    parser.add_argument('--workers', type=int, default=None, help='Número de procesos (por defecto, uno por núcleo)')
+    parser.add_argument('--years', type=int, nargs='*', help='Años a exportar (por defecto, todos)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    pages = export_report(args.output, args.db, args.workers, args.years)
+    print(f"{len(pages)} páginas exportadas en {args.output} ({time.perf_counter() - start:.1f} s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,448 @@
+import argparse
+import os
+import re
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+# Ruta por defecto de la base de datos (la misma que usa app.py)
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'happiness_data.db')
+
+# Tabla única con los datos de todos los años, una fila por (año, país)
+HAPPINESS_TABLE = 'happiness'
+
+# Esquema canónico de los datos de felicidad con su tipo estricto
+HAPPINESS_COLUMNS = [
+    ('Country', 'TEXT NOT NULL'),
+    ('Region', 'TEXT NOT NULL'),
+    ('Happiness_Rank', 'INTEGER'),
+    ('Happiness_Score', 'REAL NOT NULL'),
+    ('Standard_Error', 'REAL'),
+    ('Economy_GDP_per_Capita', 'REAL'),
+    ('Family', 'REAL'),
+    ('Health_Life_Expectancy', 'REAL'),
+    ('Freedom', 'REAL'),
+    ('Trust_Government_Corruption', 'REAL'),
+    ('Generosity', 'REAL'),
+    ('Dystopia_Residual', 'REAL'),
+]
+COLUMN_NAMES = [name for name, _ in HAPPINESS_COLUMNS]
+TEXT_COLUMNS = ['Country', 'Region']
+
+# Factores que comparan los análisis de app.py
+FACTOR_COLUMNS = [
+    'Happiness_Score',
+    'Economy_GDP_per_Capita',
+    'Family',
+    'Health_Life_Expectancy',
+    'Freedom',
+    'Trust_Government_Corruption',
+    'Generosity',
+    'Dystopia_Residual',
+]
+
+# Tabla de agregados por (año, región, factor). Además de las regiones reales guarda el
+# grupo de los TOP_N países más felices de cada año con el nombre TOP_GROUP
+AGGREGATES_TABLE = 'happiness_aggregates'
+TOP_GROUP = 'Top Global'
+TOP_N = 5
+
+# Versión de los datos de cada año: cambia solo cuando cambian las filas de ese año, así
+# la aplicación invalida las cachés de ese año y no las de los demás
+VERSIONS_TABLE = 'happiness_versions'
+
+# Centroides aproximados de cada país para los mapas (se cargan desde el CSV junto al script)
+CENTROIDS_TABLE = 'country_centroids'
+CENTROIDS_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'country_centroids.csv')
+
+# Nombres de columna de cada edición del World Happiness Report -> nombres canónicos.
+# Cada nombre canónico tiene una lista de alternativas en orden de prioridad: desde 2020
+# los CSV traen el valor crudo de cada indicador (por ejemplo "Social support") y su
+# contribución al puntaje ("Explained by: Social support"); la contribución es la que
+# corresponde a los factores de 2015-2019, por eso va primero. Los nombres se comparan
+# sin mayúsculas ni signos, así "Economy (GDP per Capita)" también reconoce el
+# "Economy..GDP.per.Capita." de 2017
+COLUMN_ALIASES = {
+    'Country': ['Country', 'Country or region', 'Country name'],
+    'Region': ['Region', 'Regional indicator'],
+    'Happiness_Rank': ['Happiness Rank', 'Overall rank'],
+    'Happiness_Score': ['Happiness Score', 'Score', 'Ladder score'],
+    'Standard_Error': ['Standard Error', 'Standard error of ladder score'],
+    'Economy_GDP_per_Capita': ['Explained by: Log GDP per capita', 'Economy (GDP per Capita)', 'GDP per capita'],
+    'Family': ['Explained by: Social support', 'Family', 'Social support'],
+    'Health_Life_Expectancy': ['Explained by: Healthy life expectancy', 'Health (Life Expectancy)', 'Healthy life expectancy'],
+    'Freedom': ['Explained by: Freedom to make life choices', 'Freedom', 'Freedom to make life choices'],
+    'Trust_Government_Corruption': ['Explained by: Perceptions of corruption', 'Trust (Government Corruption)', 'Perceptions of corruption'],
+    'Generosity': ['Explained by: Generosity', 'Generosity'],
+    'Dystopia_Residual': ['Dystopia Residual', 'Dystopia + residual'],
+}
+
+# Regiones de las ediciones recientes con el nombre que usan los datos de 2015-2016.
+# Las que no tienen equivalente directo ("North America and ANZ", "Commonwealth of
+# Independent States") se guardan tal cual. Las ediciones 2017-2019 no traen región:
+# cada país toma la del año cargado más cercano (ver nearest_regions)
+REGION_ALIASES = {
+    'Middle East and North Africa': 'Middle East and Northern Africa',
+    'Southeast Asia': 'Southeastern Asia',
+    'South Asia': 'Southern Asia',
+    'East Asia': 'Eastern Asia',
+}
+
+# Factores cuya suma, más Dystopia_Residual, da el Happiness_Score
+EXPLAINED_COLUMNS = FACTOR_COLUMNS[1:-1]
+
+
+# Nombre de columna sin mayúsculas, espacios ni signos, para comparar alias
+def column_key(name):
+    return re.sub(r'[^a-z0-9]', '', str(name).lower())
+
+
+# Función para llevar un DataFrame crudo al esquema canónico con tipos correctos. Las
+# columnas que la edición no trae se completan cuando se pueden deducir: el ranking a
+# partir del puntaje y Dystopia_Residual (o sus valores vacíos) como puntaje menos la
+# suma de los factores
+def normalize_frame(df):
+    sources = {column_key(col): col for col in df.columns}
+    mapping = {}
+    for name in COLUMN_NAMES:
+        for alias in [*COLUMN_ALIASES[name], name]:
+            if column_key(alias) in sources:
+                mapping[name] = sources[column_key(alias)]
+                break
+    missing = [name for name in ['Country', 'Happiness_Score'] if name not in mapping]
+    if missing:
+        raise ValueError(f"No se encontraron las columnas {', '.join(missing)} (columnas: {', '.join(map(str, df.columns))})")
+    ignored = [str(col) for col in df.columns if col not in mapping.values()]
+    if ignored:
+        print(f"  Columnas ignoradas: {', '.join(ignored)}")
+
+    df = pd.DataFrame({name: df[source] for name, source in mapping.items()}, index=df.index).reindex(columns=COLUMN_NAMES)
+    for col in COLUMN_NAMES:
+        if col not in TEXT_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    # Las filas sin país o sin puntaje válido (por ejemplo un encabezado repetido) se descartan
+    valid = df['Country'].notna() & df['Happiness_Score'].notna()
+    if (~valid).any():
+        print(f"  Filas descartadas por no tener datos válidos: {(~valid).sum()}")
+    df = df[valid].copy()
+    df['Country'] = df['Country'].astype(str).str.strip()
+    if 'Region' in mapping:
+        df['Region'] = df['Region'].astype(str).str.strip().replace(REGION_ALIASES)
+
+    if 'Happiness_Rank' not in mapping:
+        df['Happiness_Rank'] = df['Happiness_Score'].rank(method='min', ascending=False)
+    # Dystopia_Residual también se completa cuando la columna existe pero está vacía (por
+    # ejemplo al migrar una base de datos que la guardó como NULL)
+    if all(col in mapping for col in EXPLAINED_COLUMNS):
+        residual = df['Happiness_Score'] - df[EXPLAINED_COLUMNS].sum(axis=1, skipna=False)
+        df['Dystopia_Residual'] = df['Dystopia_Residual'].fillna(residual)
+    df['Happiness_Rank'] = df['Happiness_Rank'].astype('Int64')
+    return df.reset_index(drop=True)
+
+
+# Función para leer una tabla heredada que guarda el encabezado del CSV como primera fila.
+# Ese encabezado indica qué columna original quedó en cada posición (en 2016 las columnas
+# de intervalo de confianza desplazaron a los factores), así que se usa para renombrar
+def read_legacy_table(conn, table):
+    df = pd.read_sql_query(f'SELECT * FROM "{table}" ORDER BY rowid', conn)
+    header_rows = df['Country'] == 'Country'
+    if header_rows.any():
+        df.columns = [str(value) for value in df[header_rows].iloc[0]]
+        df = df[~header_rows.values]
+    return normalize_frame(df)
+
+
+# Función para leer un CSV del World Happiness Report
+def read_csv(path):
+    return normalize_frame(pd.read_csv(path))
+
+
+# Índice que ya no se usa: la aplicación lee cada año completo por la llave primaria y
+# lo ordena en memoria (CountryTable), así que solo encarecía las escrituras
+UNUSED_INDEXES = [f'idx_{HAPPINESS_TABLE}_year_region_score']
+
+
+# Función para crear la tabla de hechos con tipos estrictos.
+# La llave primaria (Year, Country) agrupa físicamente las filas de cada año (WITHOUT ROWID)
+# y resuelve la consulta de un año (SEARCH happiness USING PRIMARY KEY (Year=?)). El único
+# índice secundario es (Year, Happiness_Score): la lista de años de la aplicación
+# (SELECT DISTINCT Year FROM happiness ORDER BY Year) lo recorre como índice cubriente
+# (SCAN happiness USING COVERING INDEX idx_happiness_year_score), que con 10^6 filas
+# tarda la mitad que recorrer la tabla
+def create_happiness_table(conn):
+    columns_sql = ',\n    '.join(f'{name} {sql_type}' for name, sql_type in HAPPINESS_COLUMNS)
+    conn.execute(f'DROP TABLE IF EXISTS {HAPPINESS_TABLE}')
+    conn.execute(f'''CREATE TABLE {HAPPINESS_TABLE} (
+    Year INTEGER NOT NULL,
+    {columns_sql},
+    PRIMARY KEY (Year, Country)
+) STRICT, WITHOUT ROWID''')
+    conn.execute(f'CREATE INDEX idx_{HAPPINESS_TABLE}_year_score ON {HAPPINESS_TABLE} (Year, Happiness_Score DESC)')
+
+
+# Función para insertar las filas de un año en la tabla de hechos
+def write_year_rows(conn, year, df):
+    rows = df[COLUMN_NAMES].astype(object).where(df[COLUMN_NAMES].notna(), None)
+    placeholders = ', '.join('?' for _ in range(len(COLUMN_NAMES) + 1))
+    conn.execute(f'DELETE FROM {HAPPINESS_TABLE} WHERE Year = ?', (year,))
+    conn.executemany(f'INSERT INTO {HAPPINESS_TABLE} VALUES ({placeholders})',
+                     ((year,) + row for row in rows.itertuples(index=False, name=None)))
+
+
+# Función para crear la tabla de agregados materializados
+def create_aggregates_table(conn):
+    conn.execute(f'DROP TABLE IF EXISTS {AGGREGATES_TABLE}')
+    conn.execute(f'''CREATE TABLE {AGGREGATES_TABLE} (
+    Year INTEGER NOT NULL,
+    Region TEXT NOT NULL,
+    Factor TEXT NOT NULL,
+    Mean REAL,
+    Count INTEGER NOT NULL,
+    Std REAL,
+    PRIMARY KEY (Year, Region, Factor)
+) STRICT, WITHOUT ROWID''')
+
+
+# Función para calcular media, cantidad y desviación estándar de cada factor por región,
+# más el grupo de los TOP_N países con mayor Happiness_Score del año
+def compute_aggregates(df):
+    top = df.nlargest(TOP_N, 'Happiness_Score').assign(Region=TOP_GROUP)
+    stats = pd.concat([df, top])[['Region'] + FACTOR_COLUMNS].groupby('Region').agg(['mean', 'count', 'std'])
+    aggregates = pd.concat([stats[factor].assign(Factor=factor) for factor in FACTOR_COLUMNS]).reset_index()
+    aggregates = aggregates.rename(columns={'mean': 'Mean', 'count': 'Count', 'std': 'Std'})
+    return aggregates[['Region', 'Factor', 'Mean', 'Count', 'Std']]
+
+
+# Función para guardar los agregados de un año
+def write_year_aggregates(conn, year, df):
+    aggregates = compute_aggregates(df)
+    rows = aggregates.astype(object).where(aggregates.notna(), None)
+    conn.execute(f'DELETE FROM {AGGREGATES_TABLE} WHERE Year = ?', (year,))
+    conn.executemany(f'INSERT INTO {AGGREGATES_TABLE} (Year, Region, Factor, Mean, Count, Std) VALUES (?, ?, ?, ?, ?, ?)',
+                     ((year,) + row for row in rows.itertuples(index=False, name=None)))
+
+
+# Función para guardar la tabla de centroides de los países
+def write_centroids(conn, centroids):
+    conn.execute(f'DROP TABLE IF EXISTS {CENTROIDS_TABLE}')
+    conn.execute(f'''CREATE TABLE {CENTROIDS_TABLE} (
+    Country TEXT NOT NULL PRIMARY KEY,
+    Latitude REAL NOT NULL,
+    Longitude REAL NOT NULL
+) STRICT''')
+    conn.executemany(f'INSERT INTO {CENTROIDS_TABLE} VALUES (?, ?, ?)',
+                     centroids[['Country', 'Latitude', 'Longitude']].itertuples(index=False, name=None))
+
+
+# Función para crear la tabla de versiones por año (si no existe)
+def create_versions_table(conn):
+    conn.execute(f'''CREATE TABLE IF NOT EXISTS {VERSIONS_TABLE} (
+    Year INTEGER NOT NULL PRIMARY KEY,
+    Version INTEGER NOT NULL
+) STRICT''')
+
+
+# Función para marcar que cambiaron los datos de un año. La versión es el instante del
+# cambio en nanosegundos, así no se repite aunque la base de datos se reconstruya
+def bump_year_version(conn, year):
+    conn.execute(f'INSERT INTO {VERSIONS_TABLE} VALUES (?, ?) ON CONFLICT (Year) DO UPDATE SET Version = excluded.Version',
+                 (year, time.time_ns()))
+
+
+# Función para dar versión a los años que todavía no tienen (bases de datos creadas antes
+# de la tabla de versiones), así sus cachés no dependen de la fecha del archivo completo
+def seed_versions(conn):
+    conn.execute(f'INSERT OR IGNORE INTO {VERSIONS_TABLE} SELECT DISTINCT Year, ? FROM {HAPPINESS_TABLE}', (time.time_ns(),))
+
+
+# Función para elegir la región de cada país para un año a partir de las filas ya
+# cargadas (DataFrame con Year, Country y Region). Se prefiere la del mismo año, luego la
+# del año anterior más cercano y por último la del año posterior más cercano; así volver
+# a cargar un año da siempre el mismo resultado aunque después se carguen años nuevos
+def nearest_regions(known, year):
+    years = known['Year'].to_numpy()
+    priority = np.where(years == year, np.inf, np.where(years < year, years, -years))
+    ordered = known.iloc[np.argsort(priority, kind='stable')]
+    return ordered.drop_duplicates('Country', keep='last').set_index('Country')['Region']
+
+
+# Función para completar la región de los países cuando la edición no la trae (known:
+# Serie país -> región). Los países sin región conocida se descartan porque Region es obligatoria
+def fill_regions(df, known):
+    df = df.assign(Region=df['Region'].fillna(df['Country'].map(known)))
+    missing = df['Region'].isna()
+    if missing.any():
+        print(f"  Países descartados por no tener región conocida: {', '.join(df.loc[missing, 'Country'])}")
+    return df[~missing].reset_index(drop=True)
+
+
+# Función para completar las regiones de varios años en orden: cada año también aporta
+# sus regiones a los años siguientes
+def fill_frames_regions(frames, known=None):
+    known = pd.DataFrame(columns=['Year', 'Country', 'Region']) if known is None else known
+    filled = {}
+    for year, df in sorted(frames.items()):
+        filled[year] = fill_regions(df, nearest_regions(known, year))
+        known = pd.concat([known[known['Year'] != year], filled[year][['Country', 'Region']].assign(Year=year)], ignore_index=True)
+    return filled
+
+
+# Función para leer la región de cada país en cada año guardado en la base de datos
+def known_regions(conn):
+    return pd.read_sql_query(f'SELECT Year, Country, Region FROM {HAPPINESS_TABLE}', conn)
+
+
+# Función para leer las filas de un año con el esquema canónico
+def read_year(conn, year):
+    df = pd.read_sql_query(f'SELECT * FROM {HAPPINESS_TABLE} WHERE Year = ? ORDER BY Country', conn, params=(year,))
+    return normalize_frame(df.drop(columns='Year'))
+
+
+# Función para marcar las filas (indexadas por país) que difieren de las guardadas.
+# Los nulos se consideran iguales entre sí; los países que no estaban cuentan como cambios
+def changed_rows(incoming, current):
+    changed = np.zeros(len(incoming), dtype=bool)
+    for col in incoming.columns:
+        if col in TEXT_COLUMNS:
+            new, old = incoming[col].to_numpy(dtype=object), current[col].to_numpy(dtype=object)
+            changed |= new != old
+        else:
+            new = incoming[col].to_numpy(dtype=float, na_value=np.nan)
+            old = current[col].to_numpy(dtype=float, na_value=np.nan)
+            changed |= (new != old) & ~(np.isnan(new) & np.isnan(old))
+    return changed
+
+
+# Función para insertar o actualizar solo las filas de un año que cambiaron, por
+# (año, país). Los países que ya estaban y no vienen en el archivo se conservan.
+# Devuelve la cantidad de filas nuevas y de filas actualizadas
+def upsert_year(conn, year, df):
+    incoming = df.drop_duplicates('Country', keep='last').set_index('Country')
+    existing = read_year(conn, year).set_index('Country')
+    changed = incoming[changed_rows(incoming, existing.reindex(incoming.index))].reset_index()
+    if changed.empty:
+        return 0, 0
+
+    inserted = int((~changed['Country'].isin(existing.index)).sum())
+    rows = changed[COLUMN_NAMES].astype(object).where(changed[COLUMN_NAMES].notna(), None)
+    columns = ', '.join(['Year', *COLUMN_NAMES])
+    placeholders = ', '.join('?' for _ in range(len(COLUMN_NAMES) + 1))
+    updates = ', '.join(f'{col} = excluded.{col}' for col in COLUMN_NAMES if col != 'Country')
+    conn.executemany(f'INSERT INTO {HAPPINESS_TABLE} ({columns}) VALUES ({placeholders}) ON CONFLICT (Year, Country) DO UPDATE SET {updates}',
+                     ((year,) + row for row in rows.itertuples(index=False, name=None)))
+    return inserted, len(changed) - inserted
+
+
+# Función para cargar años nuevos o corregidos sobre una base de datos existente sin
+# reconstruirla: por cada año solo se escriben las filas que cambiaron y, si hubo cambios,
+# se recalculan sus agregados y se actualiza su versión. Los demás años no se tocan
+def update_database(frames, db_path=DB_PATH):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        create_versions_table(conn)
+        seed_versions(conn)
+        for index in UNUSED_INDEXES:
+            conn.execute(f'DROP INDEX IF EXISTS {index}')
+        frames = fill_frames_regions(frames, known_regions(conn))
+        for year, df in sorted(frames.items()):
+            inserted, updated = upsert_year(conn, year, df)
+            if inserted or updated:
+                write_year_aggregates(conn, year, read_year(conn, year))
+                bump_year_version(conn, year)
+            print(f"{HAPPINESS_TABLE} {year}: {inserted} filas nuevas, {updated} actualizadas, {len(df) - inserted - updated} sin cambios")
+    conn.close()
+
+
+# Función para reconstruir la base de datos completa. Se escribe en un archivo temporal
+# y se reemplaza al final, así la aplicación nunca ve una base de datos a medio construir
+def rebuild_database(frames, db_path=DB_PATH, centroids_csv=CENTROIDS_CSV):
+    tmp_path = db_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    with conn:
+        create_happiness_table(conn)
+        create_aggregates_table(conn)
+        create_versions_table(conn)
+        for year, df in sorted(fill_frames_regions(frames).items()):
+            write_year_rows(conn, year, df)
+            write_year_aggregates(conn, year, df)
+            bump_year_version(conn, year)
+            print(f"{HAPPINESS_TABLE} {year}: {len(df)} filas")
+        centroids = pd.read_csv(centroids_csv)
+        write_centroids(conn, centroids)
+        missing = sorted(set().union(*(df['Country'] for df in frames.values())) - set(centroids['Country']))
+        if missing:
+            print(f"  Países sin centroide (no aparecerán en el mapa): {', '.join(missing)}")
+    conn.execute('VACUUM')
+    conn.close()
+    os.replace(tmp_path, db_path)
+
+
+# Función para leer los años que ya existen en la base de datos, tanto de la tabla
+# única como de las tablas antiguas por año (happiness_2015, happiness_2016, ...)
+def read_existing_years(db_path=DB_PATH):
+    frames = {}
+    if not os.path.exists(db_path):
+        return frames
+    conn = sqlite3.connect(db_path)
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    for table in tables:
+        match = re.fullmatch(r'happiness_(\d{4})', table)
+        if match:
+            frames[int(match.group(1))] = read_legacy_table(conn, table)
+    if HAPPINESS_TABLE in tables:
+        df = pd.read_sql_query(f'SELECT * FROM {HAPPINESS_TABLE}', conn)
+        for year, year_df in df.groupby('Year'):
+            frames[int(year)] = normalize_frame(year_df.drop(columns='Year'))
+    conn.close()
+    return frames
+
+
+# Función para deducir el año a partir del nombre del archivo (por ejemplo 2015.csv)
+def year_from_path(path):
+    match = re.search(r'(\d{4})', os.path.basename(path))
+    if not match:
+        raise ValueError(f"No se pudo deducir el año del archivo {path}")
+    return int(match.group(1))
+
+
+# Función para saber si la base de datos ya tiene la tabla única (y se puede actualizar
+# por año en lugar de reconstruirla)
+def has_happiness_table(db_path=DB_PATH):
+    if not os.path.exists(db_path):
+        return False
+    conn = sqlite3.connect(db_path)
+    found = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (HAPPINESS_TABLE,)).fetchone()
+    conn.close()
+    return found is not None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Carga los CSV del World Happiness Report en happiness_data.db con columnas tipadas y sin filas de encabezado.')
+    parser.add_argument('csv', nargs='*', help='CSV del World Happiness Report; el año se toma del nombre del archivo (por ejemplo 2015.csv)')
+    parser.add_argument('--db', default=DB_PATH, help='Ruta de la base de datos SQLite')
+    parser.add_argument('--rebuild', action='store_true', help='Reconstruir la base de datos completa en lugar de actualizar solo los años de los CSV')
+    args = parser.parse_args()
+
+    csv_frames = {year_from_path(path): read_csv(path) for path in args.csv}
+
+    # Con CSV sobre una base de datos que ya tiene la tabla única, solo se actualizan las
+    # filas que cambiaron en esos años
+    if csv_frames and not args.rebuild and has_happiness_table(args.db):
+        update_database(csv_frames, args.db)
+        return
+
+    # Sin CSV se migran las tablas existentes; los CSV dados reemplazan el año correspondiente
+    frames = read_existing_years(args.db)
+    frames.update(csv_frames)
+    if not frames:
+        parser.error('No hay datos para cargar: indique al menos un CSV.')
+    rebuild_database(frames, args.db)
+
+
+if __name__ == '__main__':
+    main()
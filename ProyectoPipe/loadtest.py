@@ -0,0 +1,193 @@
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+from streamlit import config as streamlit_config
+from streamlit import logger as streamlit_logger
+from streamlit.runtime import Runtime
+from streamlit.testing.v1 import AppTest
+
+# Igual que en benchmark.py: sin servidor, Streamlit avisa en cada llamada que no hay sesión
+streamlit_config.get_option('logger.level')
+streamlit_logger.set_log_level(logging.ERROR)
+
+# app.py no usa "magic" (expresiones sueltas que se muestran solas). Desactivarla evita que
+# cada rerun convierta el script en un árbol ast de Python, lo que en CPython 3.11 falla
+# de forma intermitente cuando varios hilos lo hacen al mismo tiempo
+streamlit_config.set_option('runner.magicEnabled', False)
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+# Cantidades de sesiones simultáneas por defecto
+SESSIONS = [1, 2, 4, 8, 16]
+
+# Selectores que una sesión puede cambiar (etiqueta del widget), con su peso relativo.
+# La región a comparar y el top se cambian con menos frecuencia que el resto
+ACTIONS = {
+    'Seleccionar Año': 3,
+    'Seleccionar tipo de información': 3,
+    'Región a comparar': 1,
+    'Tamaño del Top (N)': 1,
+    'Seleccionar Región': 2,
+    'Seleccionar un país': 4,
+}
+
+# Cada cuánto se mide la memoria residente mientras corre una carga (segundos)
+RSS_INTERVAL = 0.05
+
+
+# Memoria residente actual del proceso en MB (en Linux desde /proc; en otros sistemas
+# se usa el pico que informa getrusage)
+def current_rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# Hilo que guarda el máximo de memoria residente observado mientras está activo
+class RSSSampler(threading.Thread):
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak = current_rss_mb()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(RSS_INTERVAL):
+            self.peak = max(self.peak, current_rss_mb())
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        self.peak = max(self.peak, current_rss_mb())
+        return self.peak
+
+
+# AppTest no está pensado para varias sesiones en paralelo: cada rerun instala un Runtime
+# simulado en Runtime._instance y lo borra al terminar, así que el rerun de una sesión
+# puede quedarse sin Runtime porque otra sesión terminó antes. Mientras dura la carga,
+# instance() y exists() usan el último Runtime instalado cuando el global está vacío
+@contextmanager
+def shared_runtime():
+    original_instance, original_exists = Runtime.__dict__['instance'], Runtime.__dict__['exists']
+    last = []
+
+    def current(cls):
+        if cls._instance is not None:
+            last[:] = [cls._instance]
+        return last[0] if last else None
+
+    def instance(cls):
+        runtime = current(cls)
+        if runtime is None:
+            raise RuntimeError("Runtime hasn't been created!")
+        return runtime
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: current(cls) is not None)
+    try:
+        yield
+    finally:
+        Runtime.instance, Runtime.exists = original_instance, original_exists
+
+
+# Función para elegir al azar uno de los selectores que la página muestra en este momento
+def random_action(at, rng):
+    widgets = {w.label: w for w in [*at.selectbox, *at.slider] if w.label in ACTIONS}
+    labels = sorted(widgets)
+    label = rng.choices(labels, weights=[ACTIONS[label] for label in labels])[0]
+    widget = widgets[label]
+    if label == 'Tamaño del Top (N)':
+        return widget, rng.randint(widget.min, widget.max)
+    return widget, rng.choice(widget.options)
+
+
+# Una sesión simulada: abre la aplicación y cambia un selector por paso. Devuelve la
+# duración de cada rerun (en segundos) y la cantidad de reruns que terminaron con error
+def run_session(seed, steps, timeout):
+    rng = random.Random(seed)
+    latencies, errors = [], 0
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    for step in range(steps + 1):
+        if step > 0:
+            widget, value = random_action(at, rng)
+            widget.set_value(value)
+        start = time.perf_counter()
+        at.run()
+        latencies.append(time.perf_counter() - start)
+        errors += bool(at.exception)
+    return latencies, errors
+
+
+# Función para correr una carga de N sesiones simultáneas
+def run_load(sessions, steps, timeout=60, seed=0):
+    sampler = RSSSampler()
+    sampler.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        results = list(pool.map(lambda i: run_session(seed + i, steps, timeout), range(sessions)))
+    elapsed = time.perf_counter() - start
+    peak_rss = sampler.stop()
+
+    latencies = np.concatenate([latencies for latencies, _ in results]) * 1000
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'sesiones': sessions,
+        'reruns': len(latencies),
+        'errores': sum(errors for _, errors in results),
+        'p50_ms': p50,
+        'p95_ms': p95,
+        'p99_ms': p99,
+        'reruns_por_s': len(latencies) / elapsed,
+        'pico_rss_mb': peak_rss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simula sesiones simultáneas de app.py con AppTest y mide la latencia de los reruns.')
+    parser.add_argument('--sessions', type=int, nargs='*', default=SESSIONS, help='Cantidades de sesiones simultáneas a probar')
+    parser.add_argument('--steps', type=int, default=20, help='Interacciones por sesión')
+    parser.add_argument('--timeout', type=float, default=60, help='Tiempo máximo de cada rerun (segundos)')
+    parser.add_argument('--seed', type=int, default=0, help='Semilla de las interacciones')
+    parser.add_argument('--backend', choices=['vega', 'matplotlib'], help='Backend de gráficos de la aplicación (CHART_BACKEND)')
+    parser.add_argument('--no-warmup', action='store_true', help='No correr antes una sesión que llene las cachés')
+    parser.add_argument('--output', help='Guardar los resultados como JSON')
+    args = parser.parse_args()
+
+    if args.backend:
+        os.environ['CHART_BACKEND'] = args.backend
+
+    rows = []
+    with shared_runtime():
+        # Una sesión previa llena las cachés compartidas, así la primera carga no mezcla el
+        # arranque en frío con la latencia de las sesiones simultáneas
+        if not args.no_warmup:
+            run_session(args.seed, args.steps, args.timeout)
+
+        for sessions in args.sessions:
+            rows.append(run_load(sessions, args.steps, args.timeout, args.seed))
+            print(f"  {sessions} sesiones: p95 {rows[-1]['p95_ms']:.0f} ms, {rows[-1]['reruns_por_s']:.1f} reruns/s")
+
+    table = pd.DataFrame(rows).set_index('sesiones')
+    print(table.round(1).to_string())
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+import functools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# Límites (en segundos) de los buckets del histograma de Prometheus
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Cantidad de mediciones recientes que se guardan por etapa para calcular percentiles
+RECENT_SAMPLES = 1000
+
+
+# Registro de tiempos por etapa y de contadores (aciertos/fallos de caché), compartido
+# por todas las sesiones del proceso
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+
+    # Registra la duración de una etapa
+    def observe(self, stage, seconds):
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                entry = {'count': 0, 'sum': 0.0, 'max': 0.0, 'buckets': [0] * len(BUCKETS), 'recent': deque(maxlen=RECENT_SAMPLES)}
+                self._stages[stage] = entry
+            entry['count'] += 1
+            entry['sum'] += seconds
+            entry['max'] = max(entry['max'], seconds)
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    entry['buckets'][i] += 1
+            entry['recent'].append(seconds)
+
+    # Incrementa un contador con etiquetas, por ejemplo count('cache', cache='data', event='hit')
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    # Mide el bloque de código como una etapa: with metrics.stage('sqlite.query'): ...
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    # Decorador para medir una función completa
+    def timed(self, name):
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+
+    # Resumen por etapa: cantidad, total, media, p50, p95, p99 y máximo (en segundos)
+    def stage_summary(self):
+        with self._lock:
+            items = [(stage, dict(entry, recent=list(entry['recent']))) for stage, entry in self._stages.items()]
+        rows = []
+        for stage, entry in sorted(items):
+            p50, p95, p99 = np.percentile(entry['recent'], [50, 95, 99]) if entry['recent'] else (0.0, 0.0, 0.0)
+            rows.append({
+                'stage': stage,
+                'count': entry['count'],
+                'sum': entry['sum'],
+                'mean': entry['sum'] / entry['count'],
+                'p50': float(p50),
+                'p95': float(p95),
+                'p99': float(p99),
+                'max': entry['max'],
+            })
+        return rows
+
+    def counter_summary(self):
+        with self._lock:
+            items = list(self._counters.items())
+        return [{'name': name, 'labels': dict(labels), 'value': value} for (name, labels), value in sorted(items)]
+
+    # Exportación como JSON lines: una línea por etapa y por contador
+    def to_json_lines(self):
+        timestamp = time.time()
+        lines = [json.dumps({'ts': timestamp, 'type': 'stage', **row}) for row in self.stage_summary()]
+        lines += [json.dumps({'ts': timestamp, 'type': 'counter', **row}) for row in self.counter_summary()]
+        return '\n'.join(lines) + '\n'
+
+    # Exportación en el formato de texto de Prometheus
+    def to_prometheus(self, prefix='happiness'):
+        with self._lock:
+            stages = {stage: dict(entry) for stage, entry in self._stages.items()}
+            counters = dict(self._counters)
+
+        lines = [f'# HELP {prefix}_stage_seconds Duración de cada etapa del dashboard.',
+                 f'# TYPE {prefix}_stage_seconds histogram']
+        for stage, entry in sorted(stages.items()):
+            label = f'stage="{stage}"'
+            for bound, bucket_count in zip(BUCKETS, entry['buckets']):
+                lines.append(f'{prefix}_stage_seconds_bucket{{{label},le="{bound}"}} {bucket_count}')
+            lines.append(f'{prefix}_stage_seconds_bucket{{{label},le="+Inf"}} {entry["count"]}')
+            lines.append(f'{prefix}_stage_seconds_sum{{{label}}} {entry["sum"]}')
+            lines.append(f'{prefix}_stage_seconds_count{{{label}}} {entry["count"]}')
+
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f'# TYPE {prefix}_{name}_total counter')
+            for (counter_name, labels), value in sorted(counters.items()):
+                if counter_name == name:
+                    label = ','.join(f'{k}="{v}"' for k, v in labels)
+                    lines.append(f'{prefix}_{name}_total{{{label}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+# Instancia compartida (igual que las cachés, vive en un módulo importado para que
+# sobreviva a los reruns de Streamlit)
+metrics = Metrics()
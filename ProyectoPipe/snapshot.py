@@ -0,0 +1,138 @@
+import argparse
+import json
+import os
+import sqlite3
+
+import pandas as pd
+import pyarrow as pa
+
+from ingest import AGGREGATES_TABLE, CENTROIDS_TABLE, DB_PATH, HAPPINESS_TABLE
+
+# Copia columnar de la base de datos en archivos Arrow IPC (sin comprimir, así se pueden
+# abrir con memory-map y leer sin copiar). Cada tabla va en su propio archivo dentro de
+# una carpeta junto a la base de datos, por ejemplo happiness_data.snapshot/happiness.arrow
+SNAPSHOT_SUFFIX = '.snapshot'
+SNAPSHOT_TABLES = [HAPPINESS_TABLE, AGGREGATES_TABLE, CENTROIDS_TABLE]
+
+# Las filas de cada año se guardan como un solo record batch, en el mismo orden que usa
+# CountryTable (puntaje de mayor a menor; los empates por país), así leer un año es tomar
+# un batch del archivo sin recorrer los demás años
+TABLE_ORDER = {
+    HAPPINESS_TABLE: 'ORDER BY Year, Happiness_Score DESC, Country',
+    AGGREGATES_TABLE: 'ORDER BY Year, Region, Factor',
+    CENTROIDS_TABLE: 'ORDER BY Country',
+}
+
+# Llaves de los metadatos del esquema: la versión de la base de datos de la que salió la
+# copia (fecha de modificación y tamaño) y los años de cada batch
+SOURCE_KEY = b'happiness.source'
+YEARS_KEY = b'happiness.years'
+
+
+def snapshot_dir(db_path=DB_PATH):
+    return os.path.splitext(db_path)[0] + SNAPSHOT_SUFFIX
+
+
+def table_path(directory, table, fmt='arrow'):
+    return os.path.join(directory, f'{table}.{fmt}')
+
+
+# Versión de la base de datos tal como se guarda en los metadatos de la copia
+def source_version(db_path=DB_PATH):
+    stat = os.stat(db_path)
+    return json.dumps([stat.st_mtime_ns, stat.st_size]).encode()
+
+
+# Versión de la carpeta de la copia (None si no existe). Al exportar, los archivos se
+# renombran dentro de la carpeta y eso cambia su fecha de modificación
+def snapshot_version(db_path=DB_PATH, directory=None):
+    try:
+        return os.stat(directory or snapshot_dir(db_path)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+# Función para escribir una tabla como Arrow IPC: un batch por año (o uno solo si la
+# tabla no tiene años). El archivo se escribe aparte y se renombra al terminar
+def write_ipc(df, path, source):
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    groups = list(df.groupby('Year', sort=True)) if 'Year' in df.columns else [(None, df)]
+    years = [int(year) for year, _ in groups if year is not None]
+    schema = schema.with_metadata({**(schema.metadata or {}), SOURCE_KEY: source, YEARS_KEY: json.dumps(years).encode()})
+
+    tmp_path = path + '.tmp'
+    with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+        for _, group in groups:
+            writer.write_batch(pa.RecordBatch.from_pandas(group, schema=schema, preserve_index=False))
+    os.replace(tmp_path, path)
+
+
+# Función para exportar las tablas de la base de datos a la carpeta de la copia. Con
+# parquet=True también se escribe cada tabla en Parquet (para leerla desde otras
+# herramientas; la aplicación solo lee los archivos Arrow)
+def export_snapshot(db_path=DB_PATH, directory=None, parquet=False):
+    directory = directory or snapshot_dir(db_path)
+    os.makedirs(directory, exist_ok=True)
+    source = source_version(db_path)
+
+    conn = sqlite3.connect(db_path)
+    for table in SNAPSHOT_TABLES:
+        df = pd.read_sql_query(f'SELECT * FROM {table} {TABLE_ORDER[table]}', conn)
+        write_ipc(df, table_path(directory, table), source)
+        if parquet:
+            df.to_parquet(table_path(directory, table, 'parquet'), index=False)
+        print(f"{table}: {len(df)} filas -> {table_path(directory, table)}")
+    conn.close()
+    return directory
+
+
+# Copia abierta con memory-map. Los batches se leen del archivo solo cuando se piden y
+# las columnas numéricas de to_pandas apuntan directamente al archivo mapeado
+class Snapshot:
+    def __init__(self, readers):
+        self.readers = readers
+        self.years = {table: json.loads(reader.schema.metadata[YEARS_KEY]) for table, reader in readers.items()}
+
+    # Filas de un año de una tabla (un DataFrame vacío con las mismas columnas si el año no está)
+    def year_frame(self, table, year):
+        reader = self.readers[table]
+        if year not in self.years[table]:
+            return reader.schema.empty_table().to_pandas()
+        batch = reader.get_batch(self.years[table].index(year))
+        return batch.to_pandas(split_blocks=True)
+
+    def table_frame(self, table):
+        return self.readers[table].read_all().to_pandas(split_blocks=True)
+
+
+# Función para abrir la copia de una base de datos. Devuelve None si no existe, si le falta
+# alguna tabla o si salió de otra versión de la base de datos (entonces se usa SQLite)
+def open_snapshot(db_path=DB_PATH, directory=None):
+    directory = directory or snapshot_dir(db_path)
+    source = source_version(db_path)
+    readers = {}
+    for table in SNAPSHOT_TABLES:
+        path = table_path(directory, table)
+        if not os.path.exists(path):
+            return None
+        try:
+            reader = pa.ipc.open_file(pa.memory_map(path))
+        except (OSError, pa.ArrowInvalid):
+            return None
+        if (reader.schema.metadata or {}).get(SOURCE_KEY) != source:
+            return None
+        readers[table] = reader
+    return Snapshot(readers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exporta happiness_data.db a archivos Arrow IPC que la aplicación abre con memory-map.')
+    parser.add_argument('--db', default=DB_PATH, help='Ruta de la base de datos SQLite')
+    parser.add_argument('--dir', help='Carpeta de la copia (por defecto, junto a la base de datos)')
+    parser.add_argument('--parquet', action='store_true', help='Escribir también cada tabla en Parquet')
+    args = parser.parse_args()
+    export_snapshot(args.db, args.dir, args.parquet)
+
+
+if __name__ == '__main__':
+    main()
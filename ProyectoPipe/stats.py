@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+
+from ingest import FACTOR_COLUMNS
+
+# Multiplicador del rango intercuartílico para los límites de outliers (regla de Tukey)
+IQR_FACTOR = 1.5
+
+
+# Función para calcular cuantiles de cada columna de una matriz ya ordenada por columna
+# (los NaN al final), con la misma interpolación lineal que pandas.quantile
+def sorted_quantiles(ordered, counts, qs):
+    columns = np.arange(ordered.shape[1])
+    last = np.maximum(counts - 1, 0)
+    result = np.full((len(qs), ordered.shape[1]), np.nan)
+    if len(ordered) == 0:
+        return result
+    for i, q in enumerate(qs):
+        position = q * last
+        lower = np.floor(position).astype(int)
+        upper = np.ceil(position).astype(int)
+        weight = position - lower
+        result[i] = ordered[lower, columns] * (1 - weight) + ordered[upper, columns] * weight
+    result[:, counts == 0] = np.nan
+    return result
+
+
+# Función para calcular la moda de cada columna de una matriz ya ordenada por columna.
+# Recorre la matriz una sola vez como tramos de valores iguales; si hay varias modas
+# devuelve la menor (igual que mode().values[0] en pandas)
+def sorted_modes(ordered):
+    n, k = ordered.shape
+    modes = np.full(k, np.nan)
+    if n == 0:
+        return modes
+
+    flat = ordered.T.ravel()
+    starts_run = np.ones(n * k, dtype=bool)
+    starts_run[1:] = flat[1:] != flat[:-1]
+    starts_run[::n] = True  # Cada columna empieza un tramo nuevo
+    starts = np.flatnonzero(starts_run)
+    lengths = np.diff(np.append(starts, n * k))
+    run_columns = starts // n
+    run_values = flat[starts]
+    lengths[np.isnan(run_values)] = 0
+
+    # Tramos ordenados por columna, de más largo a más corto (empates por valor, que ya
+    # viene ascendente); el primero de cada columna es su moda
+    order = np.lexsort((starts, -lengths, run_columns))
+    first = order[np.searchsorted(run_columns[order], np.arange(k))]
+    found = lengths[first] > 0
+    modes[found] = run_values[first[found]]
+    return modes
+
+
+# Estadísticos descriptivos y outliers de un bloque de países x factores. Todo sale de
+# un solo ordenamiento de la matriz (cuantiles, mínimo, máximo y moda) más la media y la
+# desviación estándar de NumPy, en lugar de recorrer los factores uno por uno.
+# Las instancias se comparten entre sesiones desde la caché de datos y no se modifican
+class FactorStats:
+    def __init__(self, values, countries, factors=FACTOR_COLUMNS, iqr_factor=IQR_FACTOR):
+        values = np.asarray(values, dtype=float)
+        self.factors = list(factors)
+        self.countries = np.asarray(countries)
+        self.values = values
+
+        counts = np.count_nonzero(~np.isnan(values), axis=0)
+        ordered = np.sort(values, axis=0)
+        minimum, q1, median, q3, maximum = sorted_quantiles(ordered, counts, [0, 0.25, 0.5, 0.75, 1])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.nansum(values, axis=0) / counts
+            std = np.sqrt(np.nansum((values - mean) ** 2, axis=0) / (counts - 1))
+        std[counts < 2] = np.nan
+
+        iqr = q3 - q1
+        lower, upper = q1 - iqr_factor * iqr, q3 + iqr_factor * iqr
+        # Las comparaciones con NaN son falsas, así los valores faltantes nunca son outliers
+        self.outliers = (values < lower) | (values > upper)
+
+        # Extremos de los bigotes del diagrama de cajas: el valor más lejano que no es outlier
+        inliers = ~self.outliers & ~np.isnan(values)
+        whisker_low = np.where(inliers, values, np.inf).min(axis=0, initial=np.inf)
+        whisker_high = np.where(inliers, values, -np.inf).max(axis=0, initial=-np.inf)
+        self.whiskers = pd.DataFrame({
+            'Bigote inferior': np.where(np.isfinite(whisker_low), whisker_low, np.nan),
+            'Bigote superior': np.where(np.isfinite(whisker_high), whisker_high, np.nan),
+        }, index=pd.Index(self.factors, name='Factor'))
+
+        self.summary = pd.DataFrame({
+            'Cantidad': counts,
+            'Media': mean,
+            'Mediana': median,
+            'Moda': sorted_modes(ordered),
+            'Desviación Estándar': std,
+            'Mínimo': minimum,
+            'Q1': q1,
+            'Q3': q3,
+            'Máximo': maximum,
+            'Límite inferior': lower,
+            'Límite superior': upper,
+            'Outliers': self.outliers.sum(axis=0),
+        }, index=pd.Index(self.factors, name='Factor'))
+
+        for array in [self.values, self.outliers]:
+            array.flags.writeable = False
+
+    def __len__(self):
+        return len(self.countries)
+
+    # Países outliers de un factor con su valor (de mayor a menor)
+    def outlier_countries(self, factor):
+        column = self.factors.index(factor)
+        rows = np.flatnonzero(self.outliers[:, column])
+        outliers = pd.DataFrame({'Country': self.countries[rows], factor: self.values[rows, column]})
+        return outliers.sort_values(factor, ascending=False, ignore_index=True)
+
+    # Cuartiles, mediana y bigotes de cada factor para dibujar las cajas
+    def box_summary(self, factors=None):
+        boxes = self.summary[['Q1', 'Mediana', 'Q3']].join(self.whiskers)
+        return boxes if factors is None else boxes.loc[factors]
+
+    # Equivalente a detect_outliers del notebook: (países outliers, límite inferior, límite superior)
+    def detect_outliers(self, factor):
+        lower, upper = self.summary.loc[factor, ['Límite inferior', 'Límite superior']]
+        return self.outlier_countries(factor), lower, upper
+
+
+# Función para calcular los estadísticos de los países de una región (o de todos si
+# region es None) a partir de la tabla del año, sin volver a leer los datos
+def factor_statistics(table, region=None):
+    rows = table.top_rows(region=region)
+    return FactorStats(table.values[rows], table.countries[rows], table.factors)
+
+
+# Función para calcular los estadísticos de un DataFrame cualquiera (por ejemplo en el
+# notebook). Reemplaza a calcular_estadisticos: devuelve un factor por fila
+def describe_frame(df, factors=FACTOR_COLUMNS):
+    factors = [factor for factor in factors if factor in df.columns]
+    return FactorStats(df[factors].to_numpy(dtype=float, na_value=np.nan), df['Country'].to_numpy(), factors)
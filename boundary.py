@@ -0,0 +1,184 @@
+import hashlib
+import inspect
+from collections import OrderedDict
+
+import numpy as np
+
+# Resolución por defecto de la grilla (puntos por eje), la misma de los notebooks
+STEPS = 1000
+
+# Separación (en puntos de la grilla fina) de la primera grilla gruesa. Debe ser potencia
+# de 2: en cada nivel las celdas se dividen en cuatro. Una región de una clase más angosta
+# que esta separación puede quedar sin detectar; se reduce para modelos con islas pequeñas
+COARSE_STEP = 16
+
+# Con grillas de hasta DENSE_STEPS puntos por eje se evalúan todos los puntos (son pocos
+# y una celda gruesa sería una parte grande de la grilla)
+DENSE_STEPS = 64
+
+# Puntos que se le pasan al modelo en cada llamada a predict (memoria acotada)
+BATCH_SIZE = 65536
+
+# Cantidad de grillas que se guardan (modelo, límites, resolución)
+CACHE_SIZE = 16
+_cache = OrderedDict()
+
+
+# Grilla de clases de un límite de decisión: x e y son los ejes (para contourf), Z tiene
+# una fila por valor de y, igual que con np.meshgrid. predictions cuenta los puntos que
+# se evaluaron con el modelo
+class DecisionGrid:
+    def __init__(self, x, y, Z, predictions):
+        self.x = x
+        self.y = y
+        self.Z = Z
+        self.predictions = predictions
+        # La grilla se comparte desde la caché: los arreglos son de solo lectura
+        for array in [self.x, self.y, self.Z]:
+            array.flags.writeable = False
+
+    # Fracción de los puntos de la grilla que se evaluaron con el modelo
+    @property
+    def fraction(self):
+        return self.predictions / self.Z.size
+
+
+# Función para obtener la clase de cada punto. Los modelos de Keras devuelven
+# probabilidades: con una sola salida (sigmoide) la clase es probabilidad >= 0.5 y con
+# varias (softmax) la de mayor probabilidad
+def predict_labels(model, points):
+    kwargs = {'verbose': 0} if 'verbose' in inspect.signature(model.predict).parameters else {}
+    labels = np.asarray(model.predict(points, **kwargs))
+    if labels.ndim == 2:
+        labels = (labels[:, 0] >= 0.5).astype(int) if labels.shape[1] == 1 else labels.argmax(axis=1)
+    return labels
+
+
+# Huella de los parámetros de un modelo: los pesos de Keras (get_weights) o los atributos
+# aprendidos de scikit-learn (coef_, coefs_, intercept_, ...) junto con sus hiperparámetros
+def model_fingerprint(model):
+    digest = hashlib.blake2b(type(model).__qualname__.encode(), digest_size=16)
+    if hasattr(model, 'get_weights'):
+        items = [('weights', model.get_weights())]
+    else:
+        items = sorted(vars(model).items())
+    for name, value in items:
+        digest.update(name.encode())
+        values = value if isinstance(value, (list, tuple)) else [value]
+        for v in values:
+            if isinstance(v, np.ndarray):
+                digest.update(str((v.dtype, v.shape)).encode())
+                digest.update(np.ascontiguousarray(v).tobytes())
+            else:
+                digest.update(repr(v).encode())
+    return digest.hexdigest()
+
+
+# Evaluación de la grilla por niveles: se evalúan las esquinas de celdas de COARSE_STEP
+# puntos; las celdas con las cuatro esquinas de la misma clase se rellenan con esa clase
+# y solo las demás (por donde pasa el límite) se dividen en cuatro y se vuelven a evaluar,
+# hasta llegar a celdas de un punto
+class _Refiner:
+    def __init__(self, model, x, y, batch_size):
+        self.model = model
+        self.x, self.y = x, y
+        self.n = len(x)
+        self.batch_size = batch_size
+        self.codes = np.full((self.n, self.n), -1, dtype=np.int32)
+        self.classes = []
+        self.predictions = 0
+
+    # Función para evaluar los puntos (índices lineales de la grilla) que aún no tienen clase,
+    # por lotes de batch_size
+    def evaluate(self, index):
+        flat = self.codes.reshape(-1)
+        index = np.unique(index)
+        index = index[flat[index] < 0]
+        for start in range(0, len(index), self.batch_size):
+            batch = index[start:start + self.batch_size]
+            rows, cols = np.divmod(batch, self.n)
+            labels = predict_labels(self.model, np.column_stack([self.x[cols], self.y[rows]]))
+            flat[batch] = self.encode(labels)
+        self.predictions += len(index)
+
+    # Códigos enteros de las clases (en el orden en que aparecen)
+    def encode(self, labels):
+        values, inverse = np.unique(labels, return_inverse=True)
+        for value in values:
+            if value not in self.classes:
+                self.classes.append(value)
+        lookup = np.array([self.classes.index(value) for value in values], dtype=np.int32)
+        return lookup[inverse.reshape(-1)]
+
+    def run(self, step):
+        n = self.n
+        last = n - 1
+        cells = -(-last // step)
+        rows, cols = [a.ravel() for a in np.meshgrid(np.arange(cells), np.arange(cells), indexing='ij')]
+
+        while True:
+            r0, c0 = rows * step, cols * step
+            r1, c1 = np.minimum(r0 + step, last), np.minimum(c0 + step, last)
+            corners = np.stack([r0 * n + c0, r0 * n + c1, r1 * n + c0, r1 * n + c1])
+            self.evaluate(corners.ravel())
+
+            corner_codes = self.codes.reshape(-1)[corners]
+            uniform = (corner_codes == corner_codes[0]).all(axis=0)
+
+            # Relleno de las celdas uniformes: cada punto pertenece a la celda que empieza en
+            # su fila/columna o antes (el último punto, a la última celda)
+            cells = -(-last // step)
+            level = np.full((cells, cells), -1, dtype=np.int32)
+            level[rows[uniform], cols[uniform]] = corner_codes[0, uniform]
+            owner = np.minimum(np.arange(n) // step, cells - 1)
+            fill = level[owner[:, None], owner[None, :]]
+            mask = (fill >= 0) & (self.codes < 0)
+            self.codes[mask] = fill[mask]
+
+            if step == 1:
+                break
+            # Las celdas con esquinas de distinta clase se dividen en cuatro
+            step //= 2
+            rows = (2 * rows[~uniform, None] + np.array([0, 0, 1, 1])).ravel()
+            cols = (2 * cols[~uniform, None] + np.array([0, 1, 0, 1])).ravel()
+            keep = (rows * step < last) & (cols * step < last)
+            rows, cols = rows[keep], cols[keep]
+        return np.asarray(self.classes)[self.codes]
+
+
+# Función para elegir la separación de la primera grilla gruesa: coarse_step, pero nunca
+# más de 1/32 de la grilla (redondeado a potencia de 2), y 1 (grilla completa) con
+# grillas pequeñas
+def effective_coarse_step(steps, coarse_step=COARSE_STEP):
+    if steps <= DENSE_STEPS:
+        return 1
+    limit = 1 << (max(1, steps // 32).bit_length() - 1)
+    return min(coarse_step, limit)
+
+
+# Función para calcular la grilla del límite de decisión de un modelo entre mins y maxs
+# (dos valores cada uno) con steps puntos por eje. Devuelve lo mismo que predecir la
+# grilla completa (salvo regiones más angostas que la grilla gruesa), evaluando con el
+# modelo solo los puntos cerca del límite. Las grillas se guardan por (pesos, límites,
+# resolución)
+def decision_boundary(model, mins, maxs, steps=STEPS, coarse_step=COARSE_STEP, batch_size=BATCH_SIZE):
+    if coarse_step < 1 or coarse_step & (coarse_step - 1):
+        raise ValueError(f"coarse_step debe ser potencia de 2, no {coarse_step}")
+    if steps < 2:
+        raise ValueError(f"steps debe ser al menos 2, no {steps}")
+    coarse_step = effective_coarse_step(steps, coarse_step)
+    bounds = (float(mins[0]), float(mins[1]), float(maxs[0]), float(maxs[1]))
+    key = (model_fingerprint(model), bounds, steps, coarse_step)
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+
+    x = np.linspace(bounds[0], bounds[2], steps)
+    y = np.linspace(bounds[1], bounds[3], steps)
+    refiner = _Refiner(model, x, y, batch_size)
+    grid = DecisionGrid(x, y, refiner.run(coarse_step), refiner.predictions)
+
+    _cache[key] = grid
+    while len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return grid
@@ -0,0 +1,72 @@
+import numpy as np
+
+
+# Función para sumar las características binarias de cada fila (la entrada de la neurona).
+# Con entradas bool/uint8 la suma se hace sin convertir la matriz; las tablas de pandas
+# binarizadas con pd.cut llegan como objetos y se convierten a enteros una sola vez
+def row_sums(X):
+    X = np.asarray(X)
+    if X.ndim == 1:
+        X = X.reshape(1, -1)
+    if X.dtype == object:
+        X = X.astype(np.int64)
+    return X.sum(axis=1, dtype=np.int64)
+
+
+# Neurona de McCulloch y Pitts: predice 1 cuando la cantidad de entradas activas es mayor
+# o igual al threshold. El threshold se elige entre 0 y el número de características
+# probando todos a la vez: como la suma de cada fila es un entero entre 0 y n, basta con
+# contar cuántas filas de cada clase tienen cada suma (np.bincount) y con sumas acumuladas
+# se obtienen los aciertos de todos los thresholds en una sola pasada. Los conteos se
+# pueden acumular por bloques (partial_fit), así el entrenamiento no necesita tener todas
+# las filas en memoria
+class MPNeuron:
+
+    def __init__(self):
+        self.threshold = None
+        self.n_features = None
+        self.positives = None  # Filas con clase 1 por cada suma posible
+        self.negatives = None  # Filas con clase 0 por cada suma posible
+
+    def model(self, x):
+        return (sum(x) >= self.threshold)
+
+    def predict(self, X):
+        return row_sums(X) >= self.threshold
+
+    # Exactitud de cada threshold posible (índice = threshold) con los conteos acumulados.
+    # Con threshold th se aciertan los positivos con suma >= th y los negativos con suma < th
+    def accuracies(self):
+        positives_above = np.cumsum(self.positives[::-1])[::-1]
+        negatives_below = np.concatenate([[0], np.cumsum(self.negatives)[:-1]])
+        return (positives_above + negatives_below) / (self.positives.sum() + self.negatives.sum())
+
+    # Acumula los conteos de un bloque de filas y actualiza el threshold
+    def partial_fit(self, X, Y):
+        X = np.asarray(X)
+        if self.n_features is None:
+            self.n_features = X.shape[1]
+            self.positives = np.zeros(self.n_features + 1, dtype=np.int64)
+            self.negatives = np.zeros(self.n_features + 1, dtype=np.int64)
+        elif X.shape[1] != self.n_features:
+            raise ValueError(f"Se esperaban {self.n_features} características, llegaron {X.shape[1]}")
+
+        sums = row_sums(X)
+        labels = np.asarray(Y).astype(bool)
+        self.positives += np.bincount(sums[labels], minlength=self.n_features + 1)
+        self.negatives += np.bincount(sums[~labels], minlength=self.n_features + 1)
+
+        # Seleccionamos el threshold que mejores resultados proporciona (el menor si hay empate)
+        self.threshold = int(np.argmax(self.accuracies()))
+        return self
+
+    def fit(self, X, Y):
+        self.n_features = None
+        return self.partial_fit(X, Y)
+
+    # Entrena con un iterable de bloques (X, Y), por ejemplo leídos de disco por partes
+    def fit_batches(self, batches):
+        self.n_features = None
+        for X, Y in batches:
+            self.partial_fit(X, Y)
+        return self